@@ -11,6 +11,97 @@ class Settings(BaseSettings):
     # Backend API настройки
     API_BASE_URL: str = "http://localhost:8000"
     API_VERSION: str = "v1"
+
+    # Пул HTTP-соединений к backend API
+    API_POOL_LIMIT: int = 100
+    API_POOL_LIMIT_PER_HOST: int = 30
+    API_KEEPALIVE_TIMEOUT: float = 30.0
+    API_DNS_CACHE_TTL: int = 300
+    API_SHUTDOWN_TIMEOUT: float = 10.0
+    # Максимум одновременных запросов к API, остальные ждут в очереди;
+    # больше API_POOL_LIMIT_PER_HOST не бывает - клиент урезает до него
+    API_MAX_CONCURRENCY: int = 30
+    # Объединять одинаковые одновременные GET-запросы в один
+    API_COALESCE_GETS: bool = True
+    # Таймаут одной попытки запроса, секунд
+    API_TIMEOUT: float = 10.0
+    # Повторы идемпотентных GET-запросов с экспоненциальной паузой
+    API_RETRY_ATTEMPTS: int = 3
+    API_RETRY_BASE_DELAY: float = 0.2
+    API_RETRY_MAX_DELAY: float = 2.0
+    # Circuit breaker: сколько неудач подряд размыкают его и через сколько секунд пробовать снова
+    API_BREAKER_FAILURES: int = 5
+    API_BREAKER_RECOVERY: float = 30.0
+    # Сколько помнить 404 при поиске пользователя и его пары, секунд
+    API_NEGATIVE_CACHE_SIZE: int = 10000
+    API_NEGATIVE_CACHE_TTL: float = 15.0
+    # Поиски пользователей и пар, пришедшие за API_BATCH_WINDOW секунд,
+    # загружаются одним запросом (не больше API_BATCH_MAX_SIZE ключей).
+    # Выключено, пока backend не поддерживает bulk-endpoint
+    API_BATCH_LOOKUPS: bool = False
+    API_BATCH_WINDOW: float = 0.002
+    API_BATCH_MAX_SIZE: int = 100
+    
+    # Кэш каталога идей
+    IDEAS_CACHE_SIZE: int = 256
+    IDEAS_CACHE_TTL: float = 300.0
+    
+    # Локальный каталог идей
+    CATALOG_PAGE_SIZE: int = 100
+    # Как часто подтягивать изменения каталога и перезагружать его целиком, секунд
+    CATALOG_SYNC_INTERVAL: float = 60.0
+    CATALOG_FULL_SYNC_INTERVAL: float = 3600.0
+    
+    # Кэш страниц истории свиданий
+    HISTORY_CACHE_SIZE: int = 1000
+    HISTORY_CACHE_TTL: float = 120.0
+    
+    # Сколько записей истории запрашивать за раз при постраничном переборе
+    HISTORY_STREAM_PAGE_SIZE: int = 50
+    
+    # Агрегированная статистика пар: обновляется на месте при изменении
+    # свиданий, а TTL лишь изредка подтягивает изменения других экземпляров
+    STATS_CACHE_SIZE: int = 10000
+    STATS_CACHE_TTL: float = 86400.0
+    STATS_PAGE_SIZE: int = 100
+    
+    # Рекомендации идей для пар
+    RECOMMEND_CATEGORY_BOOST: float = 1.0
+    RECOMMEND_EXPLORATION: float = 0.3
+    # Сколько последних свиданий учитывать при построении признаков пары
+    RECOMMEND_HISTORY_LIMIT: int = 200
+    
+    # Inline-режим: кэш результатов по запросу и cache_time для Telegram, секунд
+    INLINE_CACHE_SIZE: int = 1000
+    INLINE_CACHE_TTL: float = 300.0
+    INLINE_CACHE_TIME: int = 300
+    
+    # Уведомления партнеру: события за это время объединяются в одно сообщение, секунд
+    NOTIFY_COALESCE_WINDOW: float = 5.0
+    
+    # Напоминания о свиданиях: файл базы и за сколько секунд до свидания напоминать
+    REMINDERS_DB_PATH: str = "reminders.db"
+    REMINDER_LEAD_TIME: float = 3600.0
+    # Как часто перепроверять напоминание о еще не принятом предложении
+    REMINDER_RECHECK_INTERVAL: float = 600.0
+    
+    # Кэш пользователя и пары в AuthMiddleware
+    CONTEXT_CACHE_SIZE: int = 10000
+    CONTEXT_CACHE_TTL: float = 60.0
+    # Предупреждать, если апдейт сделал больше запросов к backend
+    UPDATE_API_CALLS_WARN: int = 3
+
+    # Сколько апдейтов обрабатывать одновременно (апдейты одного чата - по очереди)
+    UPDATE_CONCURRENCY: int = 32
+    # Сколько секунд с момента получения апдейта дается на его обработку,
+    # включая ожидание в очереди и все запросы к backend
+    UPDATE_DEADLINE: float = 15.0
+    
+    # Ограничения исходящих сообщений Telegram
+    OUTBOUND_GLOBAL_RATE: float = 30.0
+    OUTBOUND_PER_CHAT_RATE: float = 1.0
+    OUTBOUND_PER_CHAT_BURST: int = 3
+    OUTBOUND_MAX_RETRIES: int = 3
     
     # Настройки логирования
     LOG_LEVEL: str = "INFO"
@@ -21,9 +112,19 @@ class Settings(BaseSettings):
     
     REDIS_URL: str = "redis://localhost:6379"
     
+    # Хранилище FSM: "memory" или "redis"
+    FSM_STORAGE: str = "memory"
+    FSM_KEY_PREFIX: str = "couple_bot"
+    # Время жизни состояния и данных FSM в Redis, секунд (0 - без ограничения)
+    FSM_STATE_TTL: int = 86400
+    FSM_DATA_TTL: int = 86400
+    
     # Настройки для развертывания
+    # Если WEBHOOK_URL задан (публичный адрес без пути), бот работает через webhook
     WEBHOOK_URL: str = ""
     WEBHOOK_PATH: str = "/webhook"
+    # Секрет для заголовка X-Telegram-Bot-Api-Secret-Token
+    WEBHOOK_SECRET: str = ""
     WEBAPP_HOST: str = "0.0.0.0"
     WEBAPP_PORT: int = 8080
     
@@ -36,6 +137,11 @@ class Settings(BaseSettings):
     def api_url(self) -> str:
         """Полный URL для API"""
         return f"{self.API_BASE_URL}/api/{self.API_VERSION}"
+    
+    @property
+    def webhook_url(self) -> str:
+        """Полный URL webhook"""
+        return f"{self.WEBHOOK_URL.rstrip('/')}{self.WEBHOOK_PATH}"
 
 
 settings = Settings()
\ No newline at end of file
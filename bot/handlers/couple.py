@@ -5,6 +5,7 @@ from aiogram.fsm.context import FSMContext
 from loguru import logger
 
 from services.api_client import api_client, APIError
+from services.context import invalidate_couple
 from states import CoupleStates
 from keyboards.inline import (
     couple_setup_keyboard, 
@@ -18,7 +19,7 @@ from keyboards.reply import cancel_keyboard
 router = Router()
 
 
-@router.callback_query(F.data == "create_couple")
+@router.callback_query(F.data == "create_couple", flags={"auth": "couple"})
 async def create_couple_callback(callback: CallbackQuery, user: dict, has_couple: bool, **kwargs):
     """Создать новую пару"""
     await callback.answer()
@@ -31,8 +32,8 @@ async def create_couple_callback(callback: CallbackQuery, user: dict, has_couple
         return
     
     try:
-        async with api_client:
-            couple_data = await api_client.create_couple(user["id"])
+        couple_data = await api_client.create_couple(user["id"])
+        invalidate_couple(user["id"])
         
         invite_code = couple_data["invite_code"]
         
@@ -53,7 +54,7 @@ async def create_couple_callback(callback: CallbackQuery, user: dict, has_couple
         )
 
 
-@router.callback_query(F.data == "join_couple")
+@router.callback_query(F.data == "join_couple", flags={"auth": "couple"})
 async def join_couple_callback(callback: CallbackQuery, state: FSMContext, user: dict, has_couple: bool, **kwargs):
     """Присоединиться к паре"""
     await callback.answer()
@@ -73,7 +74,7 @@ async def join_couple_callback(callback: CallbackQuery, state: FSMContext, user:
     await state.set_state(CoupleStates.waiting_for_invite_code)
 
 
-@router.message(StateFilter(CoupleStates.waiting_for_invite_code))
+@router.message(StateFilter(CoupleStates.waiting_for_invite_code), flags={"auth": "user"})
 async def process_invite_code(message: Message, state: FSMContext, user: dict, **kwargs):
     """Обработать код приглашения"""
     invite_code = message.text.strip().upper()
@@ -84,8 +85,7 @@ async def process_invite_code(message: Message, state: FSMContext, user: dict, *
     
     try:
         # Проверяем, существует ли пара с таким кодом
-        async with api_client:
-            couple_data = await api_client.get_couple_by_code(invite_code)
+        couple_data = await api_client.get_couple_by_code(invite_code)
         
         # Проверяем, что пара не полная
         if couple_data.get("user2_id"):
@@ -115,7 +115,7 @@ async def process_invite_code(message: Message, state: FSMContext, user: dict, *
         await state.set_state(CoupleStates.waiting_for_confirmation)
         
     except APIError as e:
-        if "404" in str(e):
+        if e.is_not_found:
             await message.answer(
                 "❌ Пара с таким кодом не найдена. Проверьте код и попробуйте еще раз:",
                 reply_markup=back_keyboard()
@@ -128,7 +128,7 @@ async def process_invite_code(message: Message, state: FSMContext, user: dict, *
             )
 
 
-@router.callback_query(F.data.startswith("confirm_join_couple"))
+@router.callback_query(F.data.startswith("confirm_join_couple"), flags={"auth": "user"})
 async def confirm_join_couple(callback: CallbackQuery, state: FSMContext, user: dict, **kwargs):
     """Подтвердить присоединение к паре"""
     await callback.answer()
@@ -145,8 +145,9 @@ async def confirm_join_couple(callback: CallbackQuery, state: FSMContext, user:
         return
     
     try:
-        async with api_client:
-            couple_data = await api_client.join_couple(user["id"], invite_code)
+        couple_data = await api_client.join_couple(user["id"], invite_code)
+        # Партнер тоже должен увидеть обновленную пару
+        invalidate_couple(user["id"], couple_data.get("user1_id"))
         
         await callback.message.edit_text(
             f"🎉 Поздравляем! Вы успешно присоединились к паре!\n\n"
@@ -181,25 +182,20 @@ async def cancel_join_couple(callback: CallbackQuery, state: FSMContext, **kwarg
     await state.clear()
 
 
-@router.callback_query(F.data == "couple_info")
+@router.callback_query(F.data == "couple_info", flags={"auth": "couple"})
 async def couple_info_callback(callback: CallbackQuery, couple: dict, **kwargs):
     """Информация о паре"""
     await callback.answer()
     
     try:
-        async with api_client:
-            couple_data = await api_client.get_couple(couple["id"])
+        couple_data = await api_client.get_couple(couple["id"])
         
         # Получаем информацию о партнерах
         user1_name = couple_data.get("user1", {}).get("name", "Партнер 1")
         user2_name = couple_data.get("user2", {}).get("name", "Партнер 2") if couple_data.get("user2") else "Ожидание..."
         
         # Получаем статистику
-        async with api_client:
-            history = await api_client.get_date_history(couple["id"], limit=100)
-        
-        completed_dates = len([d for d in history if d.get("date_status") == "completed"])
-        pending_dates = len([d for d in history if d.get("date_status") == "pending"])
+        stats = await api_client.get_couple_stats(couple["id"])
         
         created_date = couple_data.get("created_at", "").split("T")[0] if couple_data.get("created_at") else "Неизвестно"
         
@@ -212,9 +208,9 @@ async def couple_info_callback(callback: CallbackQuery, couple: dict, **kwargs):
 
 **Статистика:**
 • 📅 Создана: {created_date}
-• ✅ Завершенные свидания: {completed_dates}
-• ⏳ Ожидающие предложения: {pending_dates}
-• 📊 Всего предложений: {len(history)}
+• ✅ Завершенные свидания: {stats.count("completed")}
+• ⏳ Ожидающие предложения: {stats.count("pending")}
+• 📊 Всего предложений: {stats.total}
 
 **Код приглашения:** `{couple_data.get('invite_code', 'Неизвестно')}`
         """
@@ -233,53 +229,37 @@ async def couple_info_callback(callback: CallbackQuery, couple: dict, **kwargs):
         )
 
 
-@router.callback_query(F.data.startswith("couple_stats_"))
+@router.callback_query(F.data.startswith("couple_stats_"), flags={"auth": "couple"})
 async def couple_stats_callback(callback: CallbackQuery, couple: dict, **kwargs):
     """Детальная статистика пары"""
     await callback.answer()
     
     try:
-        async with api_client:
-            history = await api_client.get_date_history(couple["id"], limit=100)
-        
-        # Анализируем статистику
-        total_proposals = len(history)
-        completed_dates = len([d for d in history if d.get("date_status") == "completed"])
-        accepted_dates = len([d for d in history if d.get("date_status") == "accepted"])
-        rejected_dates = len([d for d in history if d.get("date_status") == "rejected"])
-        pending_dates = len([d for d in history if d.get("date_status") == "pending"])
-        
-        # Статистика по категориям
-        categories = {}
-        for event in history:
-            if event.get("idea") and event.get("idea").get("category"):
-                category = event["idea"]["category"]
-                if category not in categories:
-                    categories[category] = 0
-                categories[category] += 1
+        stats = await api_client.get_couple_stats(couple["id"])
         
-        # Топ категории
-        top_categories = sorted(categories.items(), key=lambda x: x[1], reverse=True)[:3]
+        completed_dates = stats.count("completed")
         
         stats_text = f"""
 📊 **Детальная статистика пары**
 
 **Общие показатели:**
-• 📝 Всего предложений: {total_proposals}
+• 📝 Всего предложений: {stats.total}
 • ✅ Завершенных свиданий: {completed_dates}
-• 💕 Принятых предложений: {accepted_dates}
-• ❌ Отклоненных предложений: {rejected_dates}
-• ⏳ Ожидающих ответа: {pending_dates}
+• 💕 Принятых предложений: {stats.count("accepted")}
+• ❌ Отклоненных предложений: {stats.count("rejected")}
+• ⏳ Ожидающих ответа: {stats.count("pending")}
+• 👍 Процент принятых: {stats.acceptance_rate * 100:.1f}%
 
 **Популярные категории:**
         """
         
-        for i, (category, count) in enumerate(top_categories, 1):
+        for i, (category, count) in enumerate(stats.top_categories(3), 1):
             stats_text += f"{i}. {category}: {count} раз\n"
         
         if completed_dates > 0:
-            success_rate = (completed_dates / total_proposals) * 100 if total_proposals > 0 else 0
-            stats_text += f"\n🎯 **Процент завершенных свиданий:** {success_rate:.1f}%"
+            stats_text += f"\n🎯 **Процент завершенных свиданий:** {stats.completion_rate * 100:.1f}%"
+            if stats.last_date_at:
+                stats_text += f"\n📅 **Последнее свидание:** {stats.last_date_at.split('T')[0]}"
         
         await callback.message.edit_text(
             stats_text,
@@ -295,14 +275,13 @@ async def couple_stats_callback(callback: CallbackQuery, couple: dict, **kwargs)
         )
 
 
-@router.callback_query(F.data.startswith("invite_code_"))
+@router.callback_query(F.data.startswith("invite_code_"), flags={"auth": "couple"})
 async def invite_code_callback(callback: CallbackQuery, couple: dict, **kwargs):
     """Показать код приглашения"""
     await callback.answer()
     
     try:
-        async with api_client:
-            couple_data = await api_client.get_couple(couple["id"])
+        couple_data = await api_client.get_couple(couple["id"])
         
         invite_code = couple_data.get("invite_code")
         
@@ -324,7 +303,7 @@ async def invite_code_callback(callback: CallbackQuery, couple: dict, **kwargs):
 
 
 # Обработчики для Reply клавиатур
-@router.message(F.text == "👫 Моя пара")
+@router.message(F.text == "👫 Моя пара", flags={"auth": "couple"})
 async def couple_info_message(message: Message, couple: dict, **kwargs):
     """Информация о паре через Reply клавиатуру"""
     # Используем тот же код, что и в callback
@@ -337,7 +316,7 @@ async def couple_info_message(message: Message, couple: dict, **kwargs):
     await couple_info_callback(fake_callback, couple=couple, **kwargs)
 
 
-@router.message(F.text == "➕ Создать пару")
+@router.message(F.text == "➕ Создать пару", flags={"auth": "couple"})
 async def create_couple_message(message: Message, user: dict, has_couple: bool, **kwargs):
     """Создать пару через Reply клавиатуру"""
     if has_couple:
@@ -348,8 +327,8 @@ async def create_couple_message(message: Message, user: dict, has_couple: bool,
         return
     
     try:
-        async with api_client:
-            couple_data = await api_client.create_couple(user["id"])
+        couple_data = await api_client.create_couple(user["id"])
+        invalidate_couple(user["id"])
         
         invite_code = couple_data["invite_code"]
         
@@ -370,7 +349,7 @@ async def create_couple_message(message: Message, user: dict, has_couple: bool,
         )
 
 
-@router.message(F.text == "🔗 Присоединиться")
+@router.message(F.text == "🔗 Присоединиться", flags={"auth": "couple"})
 async def join_couple_message(message: Message, state: FSMContext, user: dict, has_couple: bool, **kwargs):
     """Присоединиться к паре через Reply клавиатуру"""
     if has_couple:
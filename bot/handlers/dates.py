@@ -1,15 +1,21 @@
+import csv
+import os
+import tempfile
+from datetime import datetime
+
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, FSInputFile
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from services.api_client import (
     create_date_proposal, 
     respond_to_proposal, 
-    get_date_history,
-    get_user_by_telegram_id,
-    get_user_couple
+    get_date_history_page,
+    iter_date_history,
+    get_date_event
 )
-from keyboards.inline import proposal_response_keyboard
+from services.context import UserContext
+from keyboards.inline import proposal_response_keyboard, date_history_keyboard
 
 router = Router()
 
@@ -32,17 +38,65 @@ async def date_propose_send(message: Message, state: FSMContext):
     except ValueError:
         await message.answer("Пожалуйста, введите корректный ID идеи (число):")
 
+@router.message(DateStates.date_choice)
+async def date_propose_finish(message: Message, state: FSMContext, ctx: UserContext):
+    try:
+        scheduled_date = datetime.strptime((message.text or "").strip(), "%Y-%m-%d %H:%M")
+    except ValueError:
+        await message.answer("Пожалуйста, введите дату в формате YYYY-MM-DD HH:MM:")
+        return
+    if scheduled_date <= datetime.now():
+        await message.answer("Дата свидания должна быть в будущем. Введите другую дату:")
+        return
+    
+    try:
+        user_data = await ctx.get_user()
+        couple_data = await ctx.get_couple()
+        if not user_data or not couple_data:
+            await state.clear()
+            await message.answer("❌ Сначала зарегистрируйтесь и создайте пару.")
+            return
+        
+        data = await state.get_data()
+        await create_date_proposal(
+            couple_id=couple_data["id"],
+            idea_id=data["idea_id"],
+            proposer_id=user_data["id"],
+            scheduled_date=scheduled_date.isoformat()
+        )
+        await state.clear()
+        await message.answer(
+            f"Предложение отправлено ✅\n"
+            f"📅 {scheduled_date:%d.%m.%Y %H:%M} - напомним вам о свидании заранее"
+        )
+    except Exception as e:
+        await state.clear()
+        await message.answer(f"Ошибка при создании предложения: {str(e)}")
+
+async def reply_to_callback(callback: CallbackQuery, text: str):
+    """Ответить на нажатие кнопки
+    
+    У сообщений, отправленных через inline-режим, нет callback.message -
+    тогда ответ показывается всплывающим уведомлением.
+    """
+    if callback.message:
+        await callback.message.answer(text)
+        await callback.answer()
+    else:
+        await callback.answer(text, show_alert=True)
+
 @router.callback_query(F.data.startswith("propose_idea_"))
-async def propose_idea_handler(callback: CallbackQuery, state: FSMContext):
+async def propose_idea_handler(callback: CallbackQuery, state: FSMContext, ctx: UserContext):
     try:
         idea_id = int(callback.data.split("_")[2])  
         
-        # Получаем информацию о пользователе
-        user_data = await get_user_by_telegram_id(callback.from_user.id)
+        # Получаем информацию о пользователе и паре
+        user_data = await ctx.get_user()
+        couple_data = await ctx.get_couple()
+        if not user_data or not couple_data:
+            await reply_to_callback(callback, "❌ Сначала зарегистрируйтесь и создайте пару.")
+            return
         user_id = user_data["id"]
-        
-        # Получаем информацию о паре
-        couple_data = await get_user_couple(user_id)
         couple_id = couple_data["id"]
         
         # Создаем предложение свидания
@@ -52,57 +106,143 @@ async def propose_idea_handler(callback: CallbackQuery, state: FSMContext):
             proposer_id=user_id
         )
         
-        await callback.message.answer("Предложение отправлено ✅")
-        await callback.answer()
+        await reply_to_callback(callback, "Предложение отправлено ✅")
         
     except Exception as e:
-        await callback.message.answer(f"Ошибка при создании предложения: {str(e)}")
-        await callback.answer()
+        await reply_to_callback(callback, f"Ошибка при создании предложения: {str(e)}")
+
+# Записей истории на одной странице
+HISTORY_PAGE_SIZE = 5
+
+async def render_history_page(couple_id: int, page: int):
+    """Текст и клавиатура страницы истории свиданий"""
+    events, has_next = await get_date_history_page(couple_id, page, HISTORY_PAGE_SIZE)
+    if not events and page == 0:
+        return "У вас ещё нет истории свиданий.", None
+    
+    blocks = [f"📚 История свиданий (стр. {page + 1})"]
+    for evt in events:
+        # Формируем текст в зависимости от структуры данных
+        idea_title = (evt.get("idea") or {}).get("title", "Неизвестная идея")
+        scheduled_date = evt.get("scheduled_date") or "Дата не указана"
+        date_status = evt.get("date_status", "pending")
+        blocks.append(
+            f"💕 {idea_title}\n"
+            f"📅 {scheduled_date}\n"
+            f"📊 Статус: {date_status}"
+        )
+    
+    return "\n\n".join(blocks), date_history_keyboard(events, page, has_next)
 
 @router.message(F.text == "/date_history")
-async def date_history(message: Message):
+async def date_history(message: Message, ctx: UserContext):
     try:
-        # Получаем информацию о пользователе
-        user_data = await get_user_by_telegram_id(message.from_user.id)
-        user_id = user_data["id"]
-        
         # Получаем информацию о паре
-        couple_data = await get_user_couple(user_id)
-        couple_id = couple_data["id"]
+        couple_data = await ctx.get_couple()
+        if not couple_data:
+            return await message.answer("❌ Вы не состоите в паре.")
         
-        # Получаем историю свиданий
-        history = await get_date_history(couple_id)
+        text, markup = await render_history_page(couple_data["id"], 0)
+        await message.answer(text, reply_markup=markup)
+                
+    except Exception as e:
+        await message.answer(f"Ошибка при получении истории: {str(e)}")
+
+@router.message(F.text == "/date_export")
+async def date_export(message: Message, ctx: UserContext):
+    """Выгрузить всю историю свиданий пары в CSV
+    
+    История читается по страницам и сразу пишется во временный файл,
+    поэтому память не растет с длиной истории.
+    """
+    couple_data = await ctx.get_couple()
+    if not couple_data:
+        return await message.answer("❌ Вы не состоите в паре.")
+    
+    fd, path = tempfile.mkstemp(prefix="date_history_", suffix=".csv")
+    try:
+        exported = 0
+        with os.fdopen(fd, "w", newline="", encoding="utf-8-sig") as file:
+            writer = csv.writer(file)
+            writer.writerow(["id", "Идея", "Категория", "Статус", "Дата свидания", "Создано"])
+            async for evt in iter_date_history(couple_data["id"]):
+                idea = evt.get("idea") or {}
+                writer.writerow([
+                    evt.get("id"),
+                    idea.get("title", ""),
+                    idea.get("category", ""),
+                    evt.get("date_status", "pending"),
+                    evt.get("scheduled_date") or "",
+                    evt.get("created_at") or "",
+                ])
+                exported += 1
         
-        if not history:
+        if not exported:
             return await message.answer("У вас ещё нет истории свиданий.")
         
-        for evt in history:
-            # Формируем текст в зависимости от структуры данных
-            idea_title = evt.get("idea", {}).get("title", "Неизвестная идея")
-            scheduled_date = evt.get("scheduled_date", "Дата не указана")
-            date_status = evt.get("date_status", "pending")
-            
-            text = (
-                f"💕 {idea_title}\n"
-                f"📅 {scheduled_date}\n"
-                f"📊 Статус: {date_status}"
-            )
-            
-            if date_status == "pending":
-                await message.answer(text, reply_markup=proposal_response_keyboard(evt["id"]))
-            else:
-                await message.answer(text)
-                
+        await message.answer_document(
+            FSInputFile(path, filename="date_history.csv"),
+            caption=f"📚 История свиданий: {exported} записей"
+        )
     except Exception as e:
-        await message.answer(f"Ошибка при получении истории: {str(e)}")
+        await message.answer(f"Ошибка при выгрузке истории: {str(e)}")
+    finally:
+        os.remove(path)
+
+@router.callback_query(F.data == "date_history")
+@router.callback_query(F.data.startswith("history_page_"))
+async def date_history_page(callback: CallbackQuery, ctx: UserContext):
+    try:
+        page = int(callback.data.split("_")[2]) if callback.data.startswith("history_page_") else 0
+        
+        couple_data = await ctx.get_couple()
+        if not couple_data:
+            await callback.answer("❌ Вы не состоите в паре.", show_alert=True)
+            return
+        
+        # Листание редактирует одно и то же сообщение
+        text, markup = await render_history_page(couple_data["id"], page)
+        await callback.message.edit_text(text, reply_markup=markup)
+        await callback.answer()
+        
+    except Exception as e:
+        await callback.answer(f"Ошибка при получении истории: {str(e)}", show_alert=True)
+
+@router.callback_query(F.data.startswith("view_event_"))
+async def view_event_handler(callback: CallbackQuery):
+    try:
+        event_id = int(callback.data.split("_")[2])
+        evt = await get_date_event(event_id)
+        
+        idea_title = (evt.get("idea") or {}).get("title", "Неизвестная идея")
+        scheduled_date = evt.get("scheduled_date") or "Дата не указана"
+        date_status = evt.get("date_status", "pending")
+        text = (
+            f"💕 {idea_title}\n"
+            f"📅 {scheduled_date}\n"
+            f"📊 Статус: {date_status}"
+        )
+        
+        if date_status == "pending":
+            await callback.message.answer(text, reply_markup=proposal_response_keyboard(event_id))
+        else:
+            await callback.message.answer(text)
+        await callback.answer()
+        
+    except Exception as e:
+        await callback.answer(f"Ошибка: {str(e)}", show_alert=True)
 
 @router.callback_query(F.data.startswith("accept_"))
-async def date_accept_handler(callback: CallbackQuery):
+async def date_accept_handler(callback: CallbackQuery, ctx: UserContext):
     try:
         event_id = int(callback.data.split("_")[1])
         
         # Получаем информацию о пользователе
-        user_data = await get_user_by_telegram_id(callback.from_user.id)
+        user_data = await ctx.get_user()
+        if not user_data:
+            await callback.message.answer("❌ Пользователь не найден.")
+            await callback.answer()
+            return
         user_id = user_data["id"]
         
         await respond_to_proposal(event_id, "accepted", user_id)
@@ -114,12 +254,16 @@ async def date_accept_handler(callback: CallbackQuery):
         await callback.answer()
 
 @router.callback_query(F.data.startswith("reject_"))
-async def date_reject_handler(callback: CallbackQuery):
+async def date_reject_handler(callback: CallbackQuery, ctx: UserContext):
     try:
         event_id = int(callback.data.split("_")[1])
         
         # Получаем информацию о пользователе
-        user_data = await get_user_by_telegram_id(callback.from_user.id)
+        user_data = await ctx.get_user()
+        if not user_data:
+            await callback.message.answer("❌ Пользователь не найден.")
+            await callback.answer()
+            return
         user_id = user_data["id"]
         
         await respond_to_proposal(event_id, "rejected", user_id)
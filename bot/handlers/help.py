@@ -10,6 +10,8 @@ async def help_command(message: Message):
         "/start — начать\n"
         "/help — помощь\n"
         "/ideas — идеи для свиданий\n"
+        "/search — поиск идей\n"
         "/dates — запланированные свидания\n"
+        "/date_export — выгрузить историю свиданий\n"
         "/couple — информация о паре"
     )
\ No newline at end of file
@@ -1,17 +1,29 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from states import IdeaStates, DateProposalStates
 from services.api_client import (
     get_ideas, add_idea, update_idea, delete_idea, get_random_idea,
-    get_user_by_telegram_id, get_user_couple, create_date_proposal
+    create_date_proposal, iter_date_history
 )
-from keyboards.inline import idea_action_keyboard
+from services.context import UserContext
+from services.catalog import idea_catalog, shuffle_bag
+from services.recommend import recommend_ideas
+from services.search import search_ideas
+from middlewares.outbound import bulk_lane
+from keyboards.inline import idea_action_keyboard, search_results_keyboard
 from loguru import logger
-import random
 
 router = Router()
 
+# Сколько идей показывать при выборе идеи для свидания
+SELECTION_SIZE = 10
+# Сколько результатов показывать в поиске
+SEARCH_LIMIT = 10
+# Сколько последних предложений показывать в "Мои предложения"
+SUGGESTIONS_LIMIT = 20
+
 @router.message(F.text == "/ideas")
 async def show_ideas(message: Message):
     """Показать все идеи"""
@@ -20,18 +32,52 @@ async def show_ideas(message: Message):
         if not ideas:
             return await message.answer("На данный момент нет идей 😔")
         
-        for idea in ideas:
-            await message.answer(
-                f"📝 *{idea['title']}*\n{idea['description']}",
-                parse_mode="Markdown",
-                reply_markup=idea_action_keyboard(idea_id=idea['id'])
-            )
+        with bulk_lane():
+            for idea in ideas:
+                await message.answer(
+                    f"📝 *{idea['title']}*\n{idea['description']}",
+                    parse_mode="Markdown",
+                    reply_markup=idea_action_keyboard(idea_id=idea['id'])
+                )
     except Exception as e:
         logger.error(f"Error getting ideas: {e}")
         await message.answer("Произошла ошибка при получении идей 😔")
 
+@router.message(Command("search"))
+async def search_handler(message: Message, command: CommandObject):
+    """Поиск идей по тексту: /search <запрос>"""
+    query = (command.args or "").strip()
+    if not query:
+        return await message.answer("🔍 Напишите, что искать, например: /search кино")
+    
+    if not idea_catalog.is_loaded:
+        return await message.answer("Поиск временно недоступен, попробуйте позже 😔")
+    
+    ideas = search_ideas(query, limit=SEARCH_LIMIT)
+    if not ideas:
+        return await message.answer("По вашему запросу ничего не найдено 😔")
+    
+    await message.answer(
+        f"🔍 Найдено идей: {len(ideas)}",
+        reply_markup=search_results_keyboard(ideas)
+    )
+
+@router.callback_query(F.data.startswith("show_idea_"))
+async def show_idea_handler(callback: CallbackQuery):
+    """Показать идею из результатов поиска"""
+    idea = idea_catalog.get(int(callback.data.split("_")[-1]))
+    if not idea:
+        return await callback.answer("Идея больше не доступна", show_alert=True)
+    
+    await callback.message.answer(
+        f"📝 *{idea['title']}*\n{idea['description']}",
+        parse_mode="Markdown",
+        reply_markup=idea_action_keyboard(idea_id=idea['id'])
+    )
+    await callback.answer()
+
 @router.callback_query(F.data.startswith("idea_"))
-async def idea_action_handler(callback: CallbackQuery, state: FSMContext):
+async def idea_action_handler(callback: CallbackQuery, state: FSMContext, ctx: UserContext):
     """Обработчик действий с идеями"""
     try:
         action, idea_id = callback.data.split('_', 1)
@@ -49,25 +95,42 @@ async def idea_action_handler(callback: CallbackQuery, state: FSMContext):
             await callback.message.edit_text("👎 Идея не понравилась")
         elif action == "idea_create_date":
             # Создаем предложение свидания на основе идеи
-            await create_date_from_idea(callback, int(idea_id))
+            await create_date_from_idea(callback, ctx, int(idea_id))
         
         await callback.answer()
     except Exception as e:
         logger.error(f"Error in idea action handler: {e}")
         await callback.answer("Произошла ошибка")
 
-@router.callback_query(F.data == "get_idea")
-async def get_random_idea_handler(callback: CallbackQuery):
+@router.callback_query(F.data.in_({"get_idea", "get_another_idea"}))
+@router.callback_query(F.data.startswith("category_"))
+async def get_random_idea_handler(callback: CallbackQuery, ctx: UserContext):
     """Получить случайную идею для свидания"""
+    category = None
+    if callback.data.startswith("category_"):
+        category = callback.data.split("_", 1)[1]
+        if category == "random":
+            category = None
+    
     try:
-        ideas = await get_ideas()
-        if not ideas:
+        if idea_catalog.is_loaded:
+            couple = await ctx.get_couple()
+            if couple:
+                # Паре - идея с учетом ее истории свиданий, без повторов до
+                # просмотра всей категории
+                ideas = await recommend_ideas(couple["id"], category=category)
+                random_idea = ideas[0] if ideas else None
+            else:
+                # Идеи не повторяются, пока пользователь не просмотрит всю категорию
+                random_idea = shuffle_bag.draw(("user", ctx.telegram_id), category)
+        else:
+            random_idea = await get_random_idea(category)
+        
+        if not random_idea:
             await callback.message.answer("На данный момент нет идей 😔")
+            await callback.answer()
             return
         
-        # Выбираем случайную идею
-        random_idea = random.choice(ideas)
-        
         await callback.message.answer(
             f"💡 *Идея для свидания:*\n\n"
             f"📝 *{random_idea['title']}*\n"
@@ -82,17 +145,17 @@ async def get_random_idea_handler(callback: CallbackQuery):
     await callback.answer()
 
 @router.callback_query(F.data == "suggest_date")
-async def suggest_date_handler(callback: CallbackQuery, state: FSMContext):
+async def suggest_date_handler(callback: CallbackQuery, state: FSMContext, ctx: UserContext):
     """Предложить свидание партнеру"""
     try:
         # Получаем пользователя
-        user = await get_user_by_telegram_id(callback.from_user.id)
+        user = await ctx.get_user()
         if not user:
             await callback.message.answer("❌ Пользователь не найден. Пожалуйста, зарегистрируйтесь.")
             return
         
         # Получаем пару пользователя
-        couple = await get_user_couple(user['id'])
+        couple = await ctx.get_couple()
         if not couple:
             await callback.message.answer("❌ Вы не состоите в паре. Создайте пару или присоединитесь к существующей.")
             return
@@ -105,8 +168,11 @@ async def suggest_date_handler(callback: CallbackQuery, state: FSMContext):
         # Сохраняем данные пары в состояние
         await state.update_data(couple_id=couple['id'], user_id=user['id'])
         
-        # Показываем доступные идеи для предложения
-        ideas = await get_ideas()
+        # Показываем доступные идеи для предложения, лучшие для пары - первыми
+        if idea_catalog.is_loaded:
+            ideas = await recommend_ideas(couple['id'], limit=SELECTION_SIZE)
+        else:
+            ideas = await get_ideas(limit=SELECTION_SIZE)
         if not ideas:
             await callback.message.answer("На данный момент нет идей для свидания 😔")
             return
@@ -151,63 +217,63 @@ async def select_idea_for_date(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 @router.callback_query(F.data == "my_suggestions")
-async def my_suggestions_handler(callback: CallbackQuery):
+async def my_suggestions_handler(callback: CallbackQuery, ctx: UserContext):
     """Показать мои предложения"""
     try:
         # Получаем пользователя
-        user = await get_user_by_telegram_id(callback.from_user.id)
+        user = await ctx.get_user()
         if not user:
             await callback.message.answer("❌ Пользователь не найден.")
             return
         
         # Получаем пару пользователя
-        couple = await get_user_couple(user['id'])
+        couple = await ctx.get_couple()
         if not couple:
             await callback.message.answer("❌ Вы не состоите в паре.")
             return
         
-        # Получаем историю предложений
-        from services.api_client import get_date_history
-        history = await get_date_history(couple['id'])
+        # История читается по страницам по мере отправки сообщений
+        shown = 0
+        with bulk_lane():
+            async for event in iter_date_history(couple['id'], limit=SUGGESTIONS_LIMIT):
+                if not shown:
+                    await callback.message.answer("📋 *Ваши предложения свиданий:*", parse_mode="Markdown")
+                shown += 1
+                
+                status_emoji = {
+                    'pending': '⏳',
+                    'accepted': '✅',
+                    'rejected': '❌',
+                    'completed': '🎉'
+                }.get(event.get('status', 'pending'), '❓')
+            
+                await callback.message.answer(
+                    f"{status_emoji} *{event.get('idea_title', 'Неизвестная идея')}*\n"
+                    f"📝 {event.get('idea_description', 'Описание отсутствует')}\n"
+                    f"📅 Создано: {event.get('created_at', 'Неизвестно')}\n"
+                    f"🔄 Статус: {event.get('status', 'pending')}",
+                    parse_mode="Markdown"
+                )
         
-        if not history:
+        if not shown:
             await callback.message.answer("📋 У вас пока нет предложений свиданий.")
-            return
-        
-        await callback.message.answer("📋 *Ваши предложения свиданий:*", parse_mode="Markdown")
-        
-        for event in history:
-            status_emoji = {
-                'pending': '⏳',
-                'accepted': '✅',
-                'rejected': '❌',
-                'completed': '🎉'
-            }.get(event.get('status', 'pending'), '❓')
-            
-            await callback.message.answer(
-                f"{status_emoji} *{event.get('idea_title', 'Неизвестная идея')}*\n"
-                f"📝 {event.get('idea_description', 'Описание отсутствует')}\n"
-                f"📅 Создано: {event.get('created_at', 'Неизвестно')}\n"
-                f"🔄 Статус: {event.get('status', 'pending')}",
-                parse_mode="Markdown"
-            )
     except Exception as e:
         logger.error(f"Error in my_suggestions_handler: {e}")
         await callback.message.answer("Произошла ошибка при получении предложений 😔")
     
     await callback.answer()
 
-async def create_date_from_idea(callback: CallbackQuery, idea_id: int):
+async def create_date_from_idea(callback: CallbackQuery, ctx: UserContext, idea_id: int):
     """Создать предложение свидания на основе идеи"""
     try:
         # Получаем пользователя
-        user = await get_user_by_telegram_id(callback.from_user.id)
+        user = await ctx.get_user()
         if not user:
             await callback.message.answer("❌ Пользователь не найден.")
             return
         
         # Получаем пару пользователя
-        couple = await get_user_couple(user['id'])
+        couple = await ctx.get_couple()
         if not couple:
             await callback.message.answer("❌ Вы не состоите в паре.")
             return
@@ -233,7 +299,7 @@ async def create_ideas_selection_keyboard(ideas):
     from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
     
     keyboard = []
-    for idea in ideas[:10]:  # Ограничиваем количество
+    for idea in ideas[:SELECTION_SIZE]:  # Ограничиваем количество
         keyboard.append([
             InlineKeyboardButton(
                 text=f"💡 {idea['title'][:30]}...",
@@ -0,0 +1,62 @@
+from typing import List
+
+from aiogram import Router
+from aiogram.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent
+from loguru import logger
+
+from config import settings
+from keyboards.inline import idea_action_keyboard
+from services.cache import TTLCache, MISSING
+from services.catalog import idea_catalog
+from services.search import search_ideas, tokenize
+
+router = Router()
+
+# Telegram показывает не больше 50 результатов на запрос
+INLINE_LIMIT = 50
+
+# Готовые результаты по нормализованному запросу (LRU + TTL)
+results_cache = TTLCache(settings.INLINE_CACHE_SIZE, settings.INLINE_CACHE_TTL)
+
+
+def build_results(query: str) -> List[InlineQueryResultArticle]:
+    """Статьи inline-режима для найденных идей"""
+    return [
+        InlineQueryResultArticle(
+            id=str(idea["id"]),
+            title=idea["title"],
+            description=(idea.get("description") or "")[:100],
+            input_message_content=InputTextMessageContent(
+                message_text=f"💡 *{idea['title']}*\n{idea.get('description') or ''}",
+                parse_mode="Markdown"
+            ),
+            reply_markup=idea_action_keyboard(idea["id"], shared=True)
+        )
+        for idea in search_ideas(query, limit=INLINE_LIMIT)
+    ]
+
+
+@router.inline_query()
+async def inline_search_handler(inline_query: InlineQuery):
+    """Поиск идей в inline-режиме: @bot <запрос>"""
+    # "Кино", "кино " и "КИНО" - один и тот же запрос
+    query = " ".join(tokenize(inline_query.query))
+    if not query or not idea_catalog.is_loaded:
+        # Пустой ответ не кэшируем в Telegram: каталог может вот-вот загрузиться
+        return await inline_query.answer([], cache_time=0)
+
+    try:
+        results = results_cache.get(query)
+        if results is MISSING:
+            results = build_results(query)
+            results_cache.set(query, results)
+
+        # Результаты не зависят от пользователя, Telegram может отдавать их всем
+        await inline_query.answer(results, cache_time=settings.INLINE_CACHE_TIME, is_personal=False)
+    except Exception as e:
+        logger.error(f"Error in inline search: {e}")
+
+
+def setup_inline() -> None:
+    """Сбрасывать кэш результатов при изменении каталога"""
+    idea_catalog.add_listener(lambda upserted, removed: results_cache.clear())
@@ -5,6 +5,7 @@ from aiogram.fsm.context import FSMContext
 from loguru import logger
 
 from services.api_client import api_client, APIError
+from services.context import invalidate_user
 from states import RegistrationStates
 from keyboards.inline import main_menu_keyboard, couple_setup_keyboard
 from keyboards.reply import registration_keyboard, main_menu_reply, cancel_keyboard
@@ -12,7 +13,7 @@ from keyboards.reply import registration_keyboard, main_menu_reply, cancel_keybo
 router = Router()
 
 
-@router.message(Command("start"))
+@router.message(Command("start"), flags={"auth": "couple"})
 async def cmd_start(
     message: Message, 
     is_registered: bool, 
@@ -47,7 +48,7 @@ async def cmd_start(
         )
 
 
-@router.message(F.text == "📝 Зарегистрироваться")
+@router.message(F.text == "📝 Зарегистрироваться", flags={"auth": "user"})
 async def start_registration(message: Message, state: FSMContext, is_registered: bool, **kwargs):
     """Начать регистрацию"""
     if is_registered:
@@ -65,7 +66,7 @@ async def start_registration(message: Message, state: FSMContext, is_registered:
     await state.set_state(RegistrationStates.waiting_for_name)
 
 
-@router.message(StateFilter(RegistrationStates.waiting_for_name), F.text != "❌ Отмена")
+@router.message(StateFilter(RegistrationStates.waiting_for_name), F.text != "❌ Отмена", flags={"auth": "user"})
 async def process_name(message: Message, state: FSMContext, user_info: dict, **kwargs):
     """Обработать введенное имя"""
     name = message.text.strip()
@@ -80,12 +81,12 @@ async def process_name(message: Message, state: FSMContext, user_info: dict, **k
     
     try:
         # Регистрируем пользователя
-        async with api_client:
-            user_data = await api_client.register_user(
-                telegram_id=user_info["telegram_id"],
-                name=name,
-                username=user_info["username"]
-            )
+        user_data = await api_client.register_user(
+            telegram_id=user_info["telegram_id"],
+            name=name,
+            username=user_info["username"]
+        )
+        invalidate_user(user_info["telegram_id"])
         
         await message.answer(
             f"✅ Отлично, {name}! Вы успешно зарегистрированы.\n\n"
@@ -114,7 +115,7 @@ async def cancel_registration(message: Message, state: FSMContext, **kwargs):
     await state.clear()
 
 
-@router.callback_query(F.data == "back_to_main")
+@router.callback_query(F.data == "back_to_main", flags={"auth": "couple"})
 async def back_to_main(callback: CallbackQuery, is_registered: bool, has_couple: bool, **kwargs):
     """Вернуться в главное меню"""
     await callback.answer()
@@ -150,6 +151,7 @@ async def cmd_help(message: Message, **kwargs):
 /start - Начать работу с ботом
 /help - Показать это сообщение
 /menu - Открыть главное меню
+/search - Найти идею для свидания
 
 **Как пользоваться:**
 1. 📝 Зарегистрируйтесь в боте
@@ -172,7 +174,7 @@ async def cmd_help(message: Message, **kwargs):
     await message.answer(help_text, parse_mode="Markdown")
 
 
-@router.message(Command("menu"))
+@router.message(Command("menu"), flags={"auth": "couple"})
 async def cmd_menu(message: Message, is_registered: bool, has_couple: bool, **kwargs):
     """Показать главное меню"""
     if not is_registered:
@@ -59,12 +59,21 @@ def category_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def idea_action_keyboard(idea_id: int) -> InlineKeyboardMarkup:
-    """Клавиатура действий с идеей"""
+def idea_action_keyboard(idea_id: int, shared: bool = False) -> InlineKeyboardMarkup:
+    """Клавиатура действий с идеей
+    
+    shared - идея отправлена через inline-режим: в таком сообщении
+    остается только кнопка предложения свидания.
+    """
     builder = InlineKeyboardBuilder()
     
+    propose = InlineKeyboardButton(text="💕 Предложить свидание", callback_data=f"propose_idea_{idea_id}")
+    if shared:
+        builder.row(propose)
+        return builder.as_markup()
+    
     builder.row(
-        InlineKeyboardButton(text="💕 Предложить свидание", callback_data=f"propose_idea_{idea_id}"),
+        propose,
         InlineKeyboardButton(text="🔄 Другая идея", callback_data="get_another_idea")
     )
     builder.row(
@@ -74,6 +83,23 @@ def idea_action_keyboard(idea_id: int) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+def search_results_keyboard(ideas: List[Dict[str, Any]]) -> InlineKeyboardMarkup:
+    """Клавиатура с результатами поиска идей"""
+    builder = InlineKeyboardBuilder()
+    
+    for idea in ideas:
+        builder.row(
+            InlineKeyboardButton(
+                text=f"💡 {idea.get('title', 'Без названия')}",
+                callback_data=f"show_idea_{idea['id']}"
+            )
+        )
+    
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_main"))
+    
+    return builder.as_markup()
+
+
 def proposal_response_keyboard(event_id: int) -> InlineKeyboardMarkup:
     """Клавиатура для ответа на предложение"""
     builder = InlineKeyboardBuilder()
@@ -117,18 +143,11 @@ def proposals_list_keyboard(proposals: List[Dict[str, Any]]) -> InlineKeyboardMa
     return builder.as_markup()
 
 
-def date_history_keyboard(history: List[Dict[str, Any]], page: int = 0) -> InlineKeyboardMarkup:
-    """Клавиатура истории свиданий с пагинацией"""
+def date_history_keyboard(history: List[Dict[str, Any]], page: int = 0, has_next: bool = False) -> InlineKeyboardMarkup:
+    """Клавиатура страницы истории свиданий с пагинацией"""
     builder = InlineKeyboardBuilder()
     
-    # Показываем 5 записей на странице
-    page_size = 5
-    start_idx = page * page_size
-    end_idx = start_idx + page_size
-    
-    page_history = history[start_idx:end_idx]
-    
-    for event in page_history:
+    for event in history:
         event_id = event.get("id")
         idea_title = event.get("idea", {}).get("title", "Неизвестная идея")
         status = event.get("date_status", "pending")
@@ -153,7 +172,7 @@ def date_history_keyboard(history: List[Dict[str, Any]], page: int = 0) -> Inlin
     nav_buttons = []
     if page > 0:
         nav_buttons.append(InlineKeyboardButton(text="◀️ Пред", callback_data=f"history_page_{page-1}"))
-    if end_idx < len(history):
+    if has_next:
         nav_buttons.append(InlineKeyboardButton(text="След ▶️", callback_data=f"history_page_{page+1}"))
     
     if nav_buttons:
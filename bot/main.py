@@ -1,13 +1,27 @@
 import asyncio
 import logging
 import os
-from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
+import signal
+from aiogram import Bot
 from aiogram.enums.parse_mode import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
 from dotenv import load_dotenv
-from handlers import start, help, couple, ideas, dates
+from config import settings
+from handlers import start, help, couple, ideas, dates, inline
 from middlewares.auth import AuthMiddleware
+from middlewares.deadline import DeadlineMiddleware
+from middlewares.outbound import OutboundRateLimiter
+from services.api_client import api_client
+from services.catalog import setup_catalog
+from services.recommend import setup_recommender
+from services.search import setup_search
+from services.notifications import partner_notifier
+from services.reminders import reminder_scheduler
+from services.catalog_sync import catalog_syncer
+from services.scheduler import SchedulingDispatcher, UpdateScheduler
+from services.storage import create_storage
 
 # Загружаем переменные окружения
 load_dotenv()
@@ -24,16 +38,61 @@ bot = Bot(
     default=DefaultBotProperties(parse_mode=ParseMode.HTML)
 )
 
+# Все исходящие запросы проходят через общий лимитер
+outbound_limiter = OutboundRateLimiter(
+    global_rate=settings.OUTBOUND_GLOBAL_RATE,
+    per_chat_rate=settings.OUTBOUND_PER_CHAT_RATE,
+    per_chat_burst=settings.OUTBOUND_PER_CHAT_BURST,
+    max_retries=settings.OUTBOUND_MAX_RETRIES
+)
+bot.session.middleware(outbound_limiter)
+
 # Инициализация диспетчера
-storage = MemoryStorage()
-dp = Dispatcher(storage=storage)
+storage = create_storage()
+scheduler = UpdateScheduler(max_concurrency=settings.UPDATE_CONCURRENCY)
+dp = SchedulingDispatcher(storage=storage, scheduler=scheduler, deadline=settings.UPDATE_DEADLINE)
+deadline_middleware = DeadlineMiddleware(budget=settings.UPDATE_DEADLINE)
 
 # Регистрация middleware
 def register_middlewares():
     """Регистрация всех middleware"""
+    dp.update.outer_middleware(deadline_middleware)
     dp.message.middleware(AuthMiddleware())
     dp.callback_query.middleware(AuthMiddleware())
 
+# Жизненный цикл общих ресурсов
+async def on_startup():
+    """Открыть пул соединений к backend API, запустить синхронизацию каталога идей и напоминания"""
+    await api_client.start()
+    await catalog_syncer.start()
+    await reminder_scheduler.start()
+
+async def on_shutdown():
+    """Закрыть пул соединений к backend API и хранилище FSM"""
+    logger.info(f"Update scheduler stats: {scheduler.get_stats()}")
+    logger.info(f"Backend API stats: {api_client.get_stats()}")
+    logger.info(f"Outbound queue stats: {outbound_limiter.get_stats()}")
+    logger.info(f"Idea catalog sync stats: {catalog_syncer.get_stats()}")
+    logger.info(f"Inline results cache stats: {inline.results_cache.stats()}")
+    logger.info(f"Partner notifications stats: {partner_notifier.get_stats()}")
+    logger.info(f"Date reminders stats: {reminder_scheduler.get_stats()}")
+    await catalog_syncer.stop()
+    await reminder_scheduler.stop()
+    await partner_notifier.stop()
+    await api_client.close()
+    await storage.close()
+
+def register_lifecycle():
+    """Регистрация хуков запуска и остановки"""
+    setup_catalog()
+    setup_recommender()
+    setup_search()
+    inline.setup_inline()
+    partner_notifier.setup(bot)
+    reminder_scheduler.setup(bot)
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+
 # Регистрация всех роутеров
 def register_handlers():
     """Регистрация всех роутеров"""
@@ -42,18 +101,76 @@ def register_handlers():
     dp.include_router(couple.router)
     dp.include_router(ideas.router)
     dp.include_router(dates.router)
+    dp.include_router(inline.router)
+
+async def run_polling():
+    """Получение апдейтов через long polling"""
+    await bot.delete_webhook(drop_pending_updates=True)
+    # Каждый апдейт - отдельная задача, параллелизм ограничивает планировщик
+    await dp.start_polling(bot, handle_as_tasks=True)
+
+async def run_webhook():
+    """Получение апдейтов через webhook
+    
+    Telegram получает 200 сразу, апдейт обрабатывается фоновой задачей.
+    Несколько реплик могут работать за одним балансировщиком: каждая
+    регистрирует один и тот же webhook и не удаляет его при остановке.
+    """
+    if not settings.WEBHOOK_SECRET:
+        logger.warning("WEBHOOK_SECRET is not set, webhook requests are not verified")
+    
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=settings.WEBHOOK_SECRET or None,
+        handle_in_background=True
+    ).register(app, path=settings.WEBHOOK_PATH)
+    # Хуки запуска и остановки диспетчера привязываются к приложению
+    setup_application(app, dp, bot=bot)
+    
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        site = web.TCPSite(runner, host=settings.WEBAPP_HOST, port=settings.WEBAPP_PORT)
+        await site.start()
+        
+        await bot.set_webhook(
+            url=settings.webhook_url,
+            secret_token=settings.WEBHOOK_SECRET or None,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+        logger.info(f"Webhook is listening on {settings.WEBAPP_HOST}:{settings.WEBAPP_PORT}{settings.WEBHOOK_PATH}")
+        
+        # Работаем до SIGTERM (docker stop, перезапуск реплики) или Ctrl+C;
+        # asyncio.run сам SIGTERM не обрабатывает, и on_shutdown бы не выполнился
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        try:
+            await stop.wait()
+        finally:
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                loop.remove_signal_handler(sig)
+        logger.info("Stop signal received, shutting down webhook")
+    finally:
+        await runner.cleanup()
 
 async def main():
     """Основная функция запуска бота"""
+    register_lifecycle()
     register_middlewares()
     register_handlers()
     
     logger.info("Bot is starting...")
     
     try:
-        await bot.delete_webhook(drop_pending_updates=True)
         # Запускаем бота
-        await dp.start_polling(bot)
+        if settings.WEBHOOK_URL:
+            await run_webhook()
+        else:
+            await run_polling()
     except Exception as e:
         logger.error(f"Ошибка при запуске бота: {e}")
     finally:
@@ -1,14 +1,30 @@
 from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
 from aiogram.types import Message, CallbackQuery
 from loguru import logger
 
-from services.api_client import api_client, APIError
+from config import settings
+from services.api_client import request_stats
+from services.context import UserContext
 
 
 class AuthMiddleware(BaseMiddleware):
-    """Middleware для проверки авторизации пользователей"""
-    
+    """Middleware для проверки авторизации пользователей
+
+    Всегда передает в обработчик ленивый контекст data["ctx"]
+    (UserContext). Заранее пользователь и пара загружаются только для
+    обработчиков, объявивших это флагом:
+
+        @router.message(Command("start"), flags={"auth": "couple"})
+
+    "user" - заполнить user, is_registered, user_info (и api_error);
+    "couple" - дополнительно заполнить couple и has_couple.
+
+    Запросы к backend за время апдейта считаются в ctx.stats; если их
+    больше UPDATE_API_CALLS_WARN, в лог пишется предупреждение.
+    """
+
     async def __call__(
         self,
         handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
@@ -16,64 +32,54 @@ class AuthMiddleware(BaseMiddleware):
         data: Dict[str, Any]
     ) -> Any:
         # Получаем telegram_id пользователя
-        if isinstance(event, Message):
-            telegram_id = event.from_user.id
-            username = event.from_user.username
-            full_name = event.from_user.full_name
-        elif isinstance(event, CallbackQuery):
-            telegram_id = event.from_user.id
-            username = event.from_user.username
-            full_name = event.from_user.full_name
-        else:
+        if not isinstance(event, (Message, CallbackQuery)) or not event.from_user:
             return await handler(event, data)
-        
-        # Проверяем, есть ли пользователь в базе
+
+        ctx = UserContext(
+            telegram_id=event.from_user.id,
+            username=event.from_user.username,
+            full_name=event.from_user.full_name
+        )
+        data["ctx"] = ctx
+
+        token = request_stats.set(ctx.stats)
         try:
-            async with api_client:
-                user_data = await api_client.get_user_by_telegram_id(telegram_id)
-                data["user"] = user_data
-                data["is_registered"] = True
-                logger.info(f"User {telegram_id} authenticated successfully")
-        except APIError as e:
-            # Пользователь не найден или другая ошибка
-            if "404" in str(e) or "not found" in str(e).lower():
-                # Пользователь не зарегистрирован
-                data["user"] = None
-                data["is_registered"] = False
-                data["user_info"] = {
-                    "telegram_id": telegram_id,
-                    "username": username,
-                    "full_name": full_name
-                }
-                logger.info(f"User {telegram_id} not registered yet")
-            else:
-                # Другая ошибка API
-                logger.error(f"API error for user {telegram_id}: {e}")
-                data["user"] = None
-                data["is_registered"] = False
-                data["api_error"] = str(e)
-        
-        # Проверяем, есть ли у пользователя пара (если он зарегистрирован)
-        if data.get("is_registered") and data.get("user"):
-            try:
-                async with api_client:
-                    user_id = data["user"]["id"]
-                    couple_data = await api_client.get_user_couple(user_id)
-                    data["couple"] = couple_data
-                    data["has_couple"] = True
-                    logger.info(f"User {telegram_id} has couple {couple_data.get('id')}")
-            except APIError as e:
-                if "404" in str(e) or "not found" in str(e).lower():
-                    # У пользователя нет пары
-                    data["couple"] = None
-                    data["has_couple"] = False
-                    logger.info(f"User {telegram_id} has no couple")
-                else:
-                    logger.error(f"Error getting couple for user {telegram_id}: {e}")
-                    data["couple"] = None
-                    data["has_couple"] = False
-        else:
-            data["couple"] = None
-            data["has_couple"] = False
-        
-        return await handler(event, data)
\ No newline at end of file
+            return await self._process(handler, event, data, ctx)
+        finally:
+            request_stats.reset(token)
+            if ctx.api_calls > settings.UPDATE_API_CALLS_WARN:
+                callback = getattr(data.get("handler"), "callback", None)
+                logger.warning(
+                    f"Update from {ctx.telegram_id} made {ctx.api_calls} backend calls "
+                    f"(handler {getattr(callback, '__name__', 'unknown')})"
+                )
+            elif ctx.api_calls:
+                logger.debug(f"Update from {ctx.telegram_id} made {ctx.api_calls} backend calls")
+
+    async def _process(
+        self,
+        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
+        event: Message | CallbackQuery,
+        data: Dict[str, Any],
+        ctx: UserContext
+    ) -> Any:
+        """Заполнить данные, запрошенные флагом auth, и вызвать обработчик"""
+        requirement = get_flag(data, "auth")
+        if requirement not in ("user", "couple"):
+            return await handler(event, data)
+
+        # Проверяем, есть ли пользователь в базе
+        user_data = await ctx.get_user()
+        data["user"] = user_data
+        data["is_registered"] = user_data is not None
+        data["user_info"] = ctx.user_info
+        if ctx.api_error:
+            data["api_error"] = ctx.api_error
+
+        # Проверяем, есть ли у пользователя пара
+        if requirement == "couple":
+            couple_data = await ctx.get_couple()
+            data["couple"] = couple_data
+            data["has_couple"] = couple_data is not None
+
+        return await handler(event, data)
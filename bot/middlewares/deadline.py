@@ -0,0 +1,38 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from services.api_client import request_deadline
+
+
+class DeadlineMiddleware(BaseMiddleware):
+    """Крайний срок обработки апдейта
+
+    Outer middleware для dp.update. Крайний срок апдейта хранится в
+    request_deadline: SchedulingDispatcher ставит его, когда апдейт
+    дождался очереди своего чата, а если апдейт пришел в обход
+    планировщика - срок ставится здесь. Срок ограничивает только работу с
+    backend: запросы APIClient получают оставшееся до срока время, а после
+    него сразу завершаются с APIError. Сам обработчик не прерывается -
+    отправка сообщений в Telegram и ответ на callback доходят до конца.
+    """
+
+    def __init__(self, budget: float):
+        self.budget = budget
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if request_deadline.get() is not None:
+            return await handler(event, data)
+
+        token = request_deadline.set(time.monotonic() + self.budget)
+        try:
+            return await handler(event, data)
+        finally:
+            request_deadline.reset(token)
@@ -0,0 +1,184 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from loguru import logger
+
+
+# Полосы исходящей очереди: интерактивные ответы обслуживаются раньше массовых
+INTERACTIVE = 0
+BULK = 1
+
+_LANE_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+_current_lane: ContextVar[int] = ContextVar("outbound_lane", default=INTERACTIVE)
+
+
+@contextmanager
+def bulk_lane() -> Iterator[None]:
+    """Отправлять сообщения внутри блока с низким приоритетом"""
+    token = _current_lane.set(BULK)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+class OutboundRateLimiter(BaseRequestMiddleware):
+    """Центральный планировщик исходящих запросов к Telegram
+
+    Запросы, адресованные чату (с chat_id), проходят два ограничения:
+    - на чат: не чаще per_chat_rate в секунду с запасом per_chat_burst;
+    - общее: token bucket на global_rate запросов в секунду.
+    Ожидающие общего лимита обслуживаются по приоритету полосы
+    (INTERACTIVE раньше BULK), внутри полосы - по порядку. На ответ 429
+    чат приостанавливается на retry_after и запрос повторяется.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        per_chat_rate: float = 1.0,
+        per_chat_burst: int = 3,
+        max_retries: int = 3,
+        max_chats: int = 10000
+    ):
+        self.global_rate = global_rate
+        self.per_chat_interval = 1.0 / per_chat_rate
+        self.per_chat_tolerance = (per_chat_burst - 1) * self.per_chat_interval
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+
+        # Общий token bucket
+        self._tokens = global_rate
+        self._updated = time.monotonic()
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._pump_task: Optional[asyncio.Task] = None
+
+        # Теоретическое время следующей отправки в чат (GCRA)
+        self._chat_tat: "OrderedDict[int, float]" = OrderedDict()
+
+        self.stats: Dict[str, Any] = {
+            "retry_after": 0,
+            "lanes": {
+                name: {"sent": 0, "queued": 0, "wait_time_total": 0.0, "wait_time_max": 0.0}
+                for name in _LANE_NAMES.values()
+            },
+        }
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        lane = _current_lane.get()
+        attempt = 0
+        while True:
+            await self._acquire(chat_id, lane)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.stats["retry_after"] += 1
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                logger.warning(f"Flood control for chat {chat_id}: retry after {e.retry_after}s")
+                self._pause_chat(chat_id, e.retry_after)
+
+    async def _acquire(self, chat_id: Any, lane: int) -> None:
+        """Дождаться разрешения на отправку в чат"""
+        lane_stats = self.stats["lanes"][_LANE_NAMES[lane]]
+        queued_at = time.monotonic()
+        lane_stats["queued"] += 1
+        try:
+            delay = self._reserve_chat(chat_id)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._acquire_global(lane)
+        finally:
+            lane_stats["queued"] -= 1
+
+        waited = time.monotonic() - queued_at
+        lane_stats["sent"] += 1
+        lane_stats["wait_time_total"] += waited
+        lane_stats["wait_time_max"] = max(lane_stats["wait_time_max"], waited)
+
+    def _reserve_chat(self, chat_id: Any) -> float:
+        """Занять ближайший слот чата и вернуть время ожидания до него"""
+        now = time.monotonic()
+        tat = max(self._chat_tat.pop(chat_id, now), now)
+        self._chat_tat[chat_id] = tat + self.per_chat_interval
+
+        while len(self._chat_tat) > self.max_chats:
+            self._chat_tat.popitem(last=False)
+
+        return max(0.0, tat - self.per_chat_tolerance - now)
+
+    def _pause_chat(self, chat_id: Any, seconds: float) -> None:
+        """Не отправлять в чат ближайшие seconds секунд"""
+        resume_at = time.monotonic() + seconds + self.per_chat_tolerance
+        self._chat_tat[chat_id] = max(self._chat_tat.get(chat_id, 0.0), resume_at)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.global_rate, self._tokens + (now - self._updated) * self.global_rate)
+        self._updated = now
+
+    async def _acquire_global(self, lane: int) -> None:
+        self._refill()
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (lane, next(self._seq), future))
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        await future
+
+    async def _pump(self) -> None:
+        """Выдавать токены ожидающим в порядке приоритета"""
+        while self._waiters:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.global_rate)
+                continue
+
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                # Ожидавшая задача отменена
+                continue
+            self._tokens -= 1
+            future.set_result(None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Метрики очереди исходящих сообщений"""
+        lanes = {}
+        for name, lane_stats in self.stats["lanes"].items():
+            sent = lane_stats["sent"]
+            lanes[name] = {
+                **lane_stats,
+                "wait_time_avg": lane_stats["wait_time_total"] / sent if sent else 0.0,
+            }
+        return {
+            "retry_after": self.stats["retry_after"],
+            "waiting_global": len(self._waiters),
+            "tracked_chats": len(self._chat_tat),
+            "lanes": lanes,
+        }
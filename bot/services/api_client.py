@@ -1,57 +1,669 @@
 import aiohttp
 import asyncio
-from typing import Dict, Any, Optional, List
+import contextvars
+import time
+from contextvars import ContextVar
+from typing import Dict, Any, AsyncIterator, Awaitable, Coroutine, Optional, List, Set, Tuple, Callable
+from urllib.parse import urlsplit
 from loguru import logger
 from config import settings
+from services.cache import TTLCache, MISSING
+from services.resilience import CircuitBreaker, RetryPolicy
+from services.stats import CoupleStats
+
+
+# Счетчики текущего апдейта (см. UserContext); None вне обработки апдейта
+request_stats: ContextVar[Optional[Dict[str, int]]] = ContextVar("request_stats", default=None)
+# Крайний срок обработки текущего апдейта (time.monotonic()); None - без ограничения
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def spawn_detached(coro: Coroutine[Any, Any, Any], tasks: Optional[Set["asyncio.Task[Any]"]] = None) -> "asyncio.Task[Any]":
+    """Запустить фоновую задачу вне контекста текущего апдейта
+
+    Задача создается с пустым контекстом: срок (request_deadline) и
+    счетчики (request_stats) апдейта, из которого ее запустили, на нее не
+    распространяются. Так запускается работа, общая для нескольких
+    апдейтов (объединенный запрос, пачка поисков) или переживающая
+    апдейт (уведомления): срок одного апдейта не должен обрывать ее для
+    остальных, а ее запросы не должны попадать в его счетчики. Если
+    передан tasks, задача хранится в нем до завершения.
+    """
+    task = asyncio.create_task(coro, context=contextvars.Context())
+    if tasks is not None:
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    return task
+
+# Изменяющие запросы не повторяются: backend мог выполнить их до сбоя
+NO_RETRY = RetryPolicy(attempts=1, timeout=settings.API_TIMEOUT)
+DEFAULT_RETRY = RetryPolicy(
+    attempts=settings.API_RETRY_ATTEMPTS,
+    timeout=settings.API_TIMEOUT,
+    base_delay=settings.API_RETRY_BASE_DELAY,
+    max_delay=settings.API_RETRY_MAX_DELAY
+)
+# Политики GET-запросов по префиксу endpoint (первая подходящая)
+RETRY_POLICIES: List[Tuple[str, RetryPolicy]] = [
+    # Пользователя и пару ждет почти каждый апдейт: короткий таймаут
+    ("/users/", RetryPolicy(
+        attempts=settings.API_RETRY_ATTEMPTS,
+        timeout=settings.API_TIMEOUT / 2,
+        base_delay=settings.API_RETRY_BASE_DELAY,
+        max_delay=settings.API_RETRY_BASE_DELAY * 4
+    )),
+    ("/couples/", RetryPolicy(
+        attempts=settings.API_RETRY_ATTEMPTS,
+        timeout=settings.API_TIMEOUT / 2,
+        base_delay=settings.API_RETRY_BASE_DELAY,
+        max_delay=settings.API_RETRY_BASE_DELAY * 4
+    )),
+]
+# Фоновые загрузки (страницы каталога) могут быть большими и никого не
+# задерживают; передается явно, а не по префиксу, чтобы не затронуть
+# запросы обработчиков к тем же endpoint
+BACKGROUND_RETRY = RetryPolicy(
+    attempts=settings.API_RETRY_ATTEMPTS + 2,
+    timeout=settings.API_TIMEOUT * 3,
+    base_delay=settings.API_RETRY_BASE_DELAY * 5,
+    max_delay=settings.API_RETRY_MAX_DELAY * 5
+)
+
+
+async def wait_shared(future: "asyncio.Future[Any]", endpoint: str, stats: Dict[str, Any]) -> Any:
+    """Дождаться общего для нескольких апдейтов запроса не дольше своего срока
+
+    Отмена или истечение срока одного ожидающего не прерывает запрос для
+    остальных. По истечении срока - APIError и счетчик deadline_exceeded
+    в stats.
+    """
+    deadline = request_deadline.get()
+    if deadline is None:
+        return await asyncio.shield(future)
+
+    started_at = time.monotonic()
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), timeout=max(deadline - started_at, 0))
+    except asyncio.TimeoutError:
+        if future.done():
+            # Таймаут самого запроса, а не срока апдейта
+            raise
+        stats["errors"] += 1
+        stats["deadline_exceeded"] += 1
+        raise APIError(
+            f"Update deadline exceeded: {endpoint}",
+            endpoint=endpoint,
+            latency=time.monotonic() - started_at
+        ) from None
+
+
+# Загрузка пачки ключей: {ключ: объект}; отсутствующий ключ - не найден
+BulkLoad = Callable[[List[Any]], Awaitable[Dict[Any, Dict[str, Any]]]]
+SingleLoad = Callable[[Any], Awaitable[Dict[str, Any]]]
+
+
+class BatchLoader:
+    """Объединение одиночных поисков в пачки (в духе DataLoader)
+
+    Вызовы load() за window секунд собираются в одну пачку (одинаковые
+    ключи - в один) и загружаются одним bulk-запросом. Пачка уходит
+    раньше, если набралось max_batch ключей. Если bulk-endpoint отвечает
+    любой ошибкой 4xx (нет такого endpoint, не тот метод, не прошла
+    валидация), загрузчик переключается на параллельные одиночные
+    запросы. Размеры пачек собираются в гистограмму.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        bulk: BulkLoad,
+        single: SingleLoad,
+        not_found: Callable[[Any], "APIError"],
+        window: float,
+        max_batch: int
+    ):
+        self.name = name
+        self.bulk = bulk
+        self.single = single
+        self.not_found = not_found
+        self.window = window
+        self.max_batch = max_batch
+        self.bulk_supported = True
+        self._pending: Dict[Any, "asyncio.Future[Dict[str, Any]]"] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+        self.histogram: Dict[str, int] = {}
+        self.stats = {
+            "loads": 0,
+            "deduplicated": 0,
+            "batches": 0,
+            "bulk_requests": 0,
+            "single_requests": 0,
+            "errors": 0,
+            "deadline_exceeded": 0,
+        }
+
+    async def load(self, key: Any) -> Dict[str, Any]:
+        """Загрузить объект по ключу в составе ближайшей пачки"""
+        self.stats["loads"] += 1
+        # Пачка загружается вне контекста апдейта - учитываем запрос здесь
+        counters = request_stats.get()
+        if counters is not None:
+            counters["api_calls"] += 1
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[key] = loop.create_future()
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush)
+        else:
+            self.stats["deduplicated"] += 1
+        return await wait_shared(future, f"{self.name} {key}", self.stats)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+
+        size = len(batch)
+        self.stats["batches"] += 1
+        bucket = f"<={1 << (size - 1).bit_length()}"
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+        spawn_detached(self._dispatch(batch), self._tasks)
+
+    async def _dispatch(self, batch: Dict[Any, "asyncio.Future[Dict[str, Any]]"]) -> None:
+        try:
+            if self.bulk_supported and len(batch) > 1:
+                try:
+                    self.stats["bulk_requests"] += 1
+                    found = await self.bulk(list(batch))
+                except APIError as e:
+                    if e.status is None or not 400 <= e.status < 500:
+                        raise
+                    self.bulk_supported = False
+                    logger.warning(f"Bulk lookup for {self.name} is not supported, using single requests")
+                else:
+                    for key, future in batch.items():
+                        item = found.get(key)
+                        if item is None:
+                            self._reject(future, self.not_found(key))
+                        else:
+                            self._resolve(future, item)
+                    return
+
+            self.stats["single_requests"] += len(batch)
+            results = await asyncio.gather(*(self.single(key) for key in batch), return_exceptions=True)
+            for future, result in zip(batch.values(), results):
+                if isinstance(result, BaseException):
+                    self._reject(future, result)
+                else:
+                    self._resolve(future, result)
+        except BaseException as e:
+            for future in batch.values():
+                self._reject(future, e)
+            if not isinstance(e, Exception):
+                raise
+
+    @staticmethod
+    def _resolve(future: "asyncio.Future[Dict[str, Any]]", result: Dict[str, Any]) -> None:
+        if not future.done():
+            future.set_result(result)
+
+    @staticmethod
+    def _reject(future: "asyncio.Future[Dict[str, Any]]", error: BaseException) -> None:
+        if not future.done():
+            future.set_exception(error)
+            # Ошибку могли уже не ждать - все вызывающие отменены
+            future.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        batches = self.stats["batches"]
+        keys = self.stats["loads"] - self.stats["deduplicated"]
+        return {
+            **self.stats,
+            "bulk_supported": self.bulk_supported,
+            "avg_batch_size": keys / batches if batches else 0.0,
+            "batch_sizes": dict(sorted(self.histogram.items(), key=lambda x: int(x[0][2:]))),
+        }
 
 
 class APIClient:
-    """Клиент для работы с backend API"""
+    """Клиент для работы с backend API
+    
+    Использует одну долгоживущую сессию с пулом соединений. Сессия
+    открывается в start() при запуске бота и закрывается в close()
+    при остановке, поэтому запросы переиспользуют открытые соединения.
+    
+    Экземпляр безопасно разделять между конкурентными задачами: сессия
+    создается под блокировкой, а число одновременных запросов ограничено
+    семафором (API_MAX_CONCURRENCY, но не больше соединений к одному
+    хосту), остальные запросы ждут в очереди.
     
-    def __init__(self):
-        self.base_url = settings.api_url
+    Одинаковые GET-запросы, вызванные с coalesce=True, пока первый из них
+    не завершился, не уходят в backend повторно: все вызывающие получают
+    результат (или ошибку) одного общего запроса. Общий запрос не
+    ограничен сроком ни одного апдейта: каждый вызывающий ждет его
+    только до своего крайнего срока.
+    
+    GET-запросы при сбоях повторяются по политике своего endpoint
+    (RETRY_POLICIES), изменяющие запросы - никогда. Для каждого хоста
+    backend ведется circuit breaker: пока backend недоступен, запросы
+    сразу завершаются APIError вместо ожидания таймаута.
+    """
+    
+    def __init__(self, base_url: Optional[str] = None, max_concurrency: Optional[int] = None):
+        self.base_url = base_url or settings.api_url
         self.session: Optional[aiohttp.ClientSession] = None
+        self.max_concurrency = max_concurrency or settings.API_MAX_CONCURRENCY
+        if settings.API_POOL_LIMIT_PER_HOST:
+            # Лишние запросы ждали бы соединения внутри aiohttp, и это
+            # ожидание съедало бы их таймаут и размыкало circuit breaker
+            self.max_concurrency = min(self.max_concurrency, settings.API_POOL_LIMIT_PER_HOST)
+        
+        # Примитивы asyncio создаются лениво внутри запущенного event loop
+        self._session_lock: Optional[asyncio.Lock] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._managed = False
+        self._closing = False
+        self._users = 0
+        
+        self._in_flight = 0
+        self._waiting = 0
+        self._coalescing: Dict[Tuple[Any, ...], "asyncio.Future[Any]"] = {}
+        self.ideas_cache = TTLCache(settings.IDEAS_CACHE_SIZE, settings.IDEAS_CACHE_TTL)
+        self._ideas_generation = 0
+        self.history_cache = TTLCache(settings.HISTORY_CACHE_SIZE, settings.HISTORY_CACHE_TTL)
+        self._history_versions: Dict[int, int] = {}
+        self._history_epoch = 0
+        self.couple_stats = TTLCache(settings.STATS_CACHE_SIZE, settings.STATS_CACHE_TTL)
+        # Поиски пользователя/пары, недавно вернувшие 404
+        self.not_found = TTLCache(settings.API_NEGATIVE_CACHE_SIZE, settings.API_NEGATIVE_CACHE_TTL)
+        self._not_found_generation = 0
+        self.user_loader = BatchLoader(
+            "users by telegram id",
+            bulk=self._bulk_users_by_telegram_id,
+            single=lambda telegram_id: self._make_request("GET", f"/users/telegram/{telegram_id}", coalesce=True),
+            not_found=lambda telegram_id: APIError(
+                "API Error 404: User not found", status=404, endpoint=f"GET /users/telegram/{telegram_id}"
+            ),
+            window=settings.API_BATCH_WINDOW,
+            max_batch=settings.API_BATCH_MAX_SIZE
+        )
+        self.couple_loader = BatchLoader(
+            "couples by user id",
+            bulk=self._bulk_couples_by_user_id,
+            single=lambda user_id: self._make_request("GET", f"/couples/user/{user_id}", coalesce=True),
+            not_found=lambda user_id: APIError(
+                "API Error 404: Couple not found", status=404, endpoint=f"GET /couples/user/{user_id}"
+            ),
+            window=settings.API_BATCH_WINDOW,
+            max_batch=settings.API_BATCH_MAX_SIZE
+        )
+        self._listeners: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.stats = {
+            "requests": 0,
+            "coalesced": 0,
+            "retries": 0,
+            "errors": 0,
+            "deadline_exceeded": 0,
+            "max_in_flight": 0,
+            "max_waiting": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+        }
     
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        self._users += 1
+        await self._ensure_session()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        self._users -= 1
+        # Сессией, открытой через start(), управляют хуки запуска бота
+        if self._users <= 0 and not self._managed:
+            self._users = 0
+            await self.close()
+    
+    async def start(self) -> None:
+        """Открыть сессию с пулом соединений"""
+        self._managed = True
+        self._closing = False
+        await self._ensure_session()
+    
+    async def _ensure_session(self) -> aiohttp.ClientSession:
+        """Вернуть открытую сессию, создав ее не более одного раза"""
+        if self._closing:
+            raise APIError("API client is closing")
+        
+        session = self.session
+        if session and not session.closed:
+            return session
+        
+        if self._session_lock is None:
+            self._session_lock = asyncio.Lock()
+        
+        async with self._session_lock:
+            if self.session and not self.session.closed:
+                return self.session
+            
+            connector = aiohttp.TCPConnector(
+                limit=settings.API_POOL_LIMIT,
+                limit_per_host=settings.API_POOL_LIMIT_PER_HOST,
+                keepalive_timeout=settings.API_KEEPALIVE_TIMEOUT,
+                use_dns_cache=True,
+                ttl_dns_cache=settings.API_DNS_CACHE_TTL
+            )
+            self.session = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._idle = asyncio.Event()
+            self._idle.set()
+            logger.info(
+                f"API session started: limit={settings.API_POOL_LIMIT}, "
+                f"limit_per_host={settings.API_POOL_LIMIT_PER_HOST}, "
+                f"max_concurrency={self.max_concurrency}"
+            )
+            return self.session
+    
+    async def close(self) -> None:
+        """Дождаться завершения активных запросов и закрыть сессию"""
+        session = self.session
+        if not session or session.closed:
+            return
+        
+        self._closing = True
+        try:
+            if self._idle and not self._idle.is_set():
+                logger.info(f"Waiting for {self._in_flight + self._waiting} API requests to finish")
+                try:
+                    await asyncio.wait_for(self._idle.wait(), timeout=settings.API_SHUTDOWN_TIMEOUT)
+                except asyncio.TimeoutError:
+                    logger.warning(f"API session closed with {self._in_flight} requests in flight")
+            
+            self.session = None
+            await session.close()
+            # Даем время на корректное закрытие SSL-соединений
+            await asyncio.sleep(0.25)
+            logger.info("API session closed")
+        finally:
+            self._closing = False
+            self._managed = False
+    
+    def subscribe(self, event: str, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """Подписаться на успешные изменения данных
+        
+        callback вызывается синхронно с ответом backend сразу после
+        успешного запроса. События: idea_created, idea_updated, idea_deleted,
+        proposal_created, proposal_responded, date_completed. В события
+        свиданий добавляются поля запроса (couple_id, idea_id, user_id...),
+        если backend не вернул их в ответе, и actor_id - id пользователя,
+        совершившего действие (поля ответа его не перекрывают).
+        """
+        self._listeners.setdefault(event, []).append(callback)
+    
+    def _emit(self, event: str, payload: Dict[str, Any]) -> None:
+        """Оповестить подписчиков; ошибка подписчика не ломает запрос"""
+        for callback in self._listeners.get(event, ()):
+            try:
+                callback(payload)
+            except Exception as e:
+                logger.exception(f"Listener for {event} failed: {e}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Текущая загрузка клиента и статистика очереди запросов"""
+        requests = self.stats["requests"]
+        return {
+            **self.stats,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "max_concurrency": self.max_concurrency,
+            "wait_time_avg": self.stats["wait_time_total"] / requests if requests else 0.0,
+            "ideas_cache": self.ideas_cache.stats(),
+            "history_cache": self.history_cache.stats(),
+            "couple_stats": self.couple_stats.stats(),
+            "not_found": self.not_found.stats(),
+            "user_loader": self.user_loader.get_stats(),
+            "couple_loader": self.couple_loader.get_stats(),
+            "breakers": {host: breaker.get_stats() for host, breaker in self._breakers.items()},
+        }
     
     async def _make_request(
         self,
         method: str,
         endpoint: str,
         data: Optional[Dict[str, Any]] = None,
-        params: Optional[Dict[str, Any]] = None
+        params: Optional[Dict[str, Any]] = None,
+        coalesce: bool = False,
+        policy: Optional[RetryPolicy] = None
+    ) -> Dict[str, Any]:
+        """Выполнить HTTP запрос к API
+        
+        policy - политика повторов вместо выбранной по endpoint.
+        """
+        if not (coalesce and method == "GET" and settings.API_COALESCE_GETS):
+            return await self._send(method, endpoint, data, params, policy)
+        
+        key = (method, f"{self.base_url}{endpoint}", tuple(sorted((params or {}).items())))
+        future = self._coalescing.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await wait_shared(future, f"{method} {endpoint}", self.stats)
+        
+        # Запрос выполняется отдельной задачей, чтобы отмена первого
+        # вызывающего не обрывала ответ для остальных; он учитывается в
+        # апдейте первого вызывающего
+        counters = request_stats.get()
+        if counters is not None:
+            counters["api_calls"] += 1
+        future = spawn_detached(self._send(method, endpoint, data, params, policy))
+        self._coalescing[key] = future
+        future.add_done_callback(lambda f: self._forget_coalesced(key, f))
+        return await wait_shared(future, f"{method} {endpoint}", self.stats)
+    
+    def _forget_coalesced(self, key: Tuple[Any, ...], future: "asyncio.Future[Any]") -> None:
+        """Убрать завершенный запрос из таблицы объединения"""
+        if self._coalescing.get(key) is future:
+            del self._coalescing[key]
+        if not future.cancelled():
+            # Помечаем исключение полученным, даже если все ожидающие отменены
+            future.exception()
+    
+    def _policy(self, method: str, endpoint: str) -> RetryPolicy:
+        """Политика повторов для запроса: повторяются только GET"""
+        if method != "GET":
+            return NO_RETRY
+        for prefix, policy in RETRY_POLICIES:
+            if endpoint.startswith(prefix):
+                return policy
+        return DEFAULT_RETRY
+    
+    def _breaker(self, url: str) -> CircuitBreaker:
+        """Circuit breaker хоста backend"""
+        host = urlsplit(url).netloc
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(
+                host,
+                failure_threshold=settings.API_BREAKER_FAILURES,
+                recovery_timeout=settings.API_BREAKER_RECOVERY
+            )
+        return breaker
+    
+    async def _send(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        policy: Optional[RetryPolicy] = None
     ) -> Dict[str, Any]:
-        """Выполнить HTTP запрос к API"""
-        if not self.session:
-            self.session = aiohttp.ClientSession()
+        """Отправить запрос с повторами и защитой circuit breaker
         
+        Повторяются только сбои соединения, таймауты и ответы 5xx; ошибки
+        4xx возвращаются сразу. Пока breaker хоста разомкнут, запрос
+        сразу завершается APIError, не занимая очередь.
+        
+        Внутри апдейта каждая попытка получает не больше времени, чем
+        осталось до его крайнего срока (request_deadline).
+        """
         url = f"{self.base_url}{endpoint}"
+        policy = policy or self._policy(method, endpoint)
+        breaker = self._breaker(url)
+        deadline = request_deadline.get()
+        started_at = time.monotonic()
         
-        try:
-            async with self.session.request(
-                method=method,
-                url=url,
-                json=data,
-                params=params,
-                timeout=aiohttp.ClientTimeout(total=30)
-            ) as response:
-                response_data = await response.json()
-                
-                if response.status >= 400:
-                    logger.error(f"API Error {response.status}: {response_data}")
-                    raise APIError(f"API Error {response.status}: {response_data.get('detail', 'Unknown error')}")
+        def error_for(message: str, status: Optional[int] = None, detail: Any = None) -> APIError:
+            return APIError(
+                message,
+                status=status,
+                endpoint=f"{method} {endpoint}",
+                latency=time.monotonic() - started_at,
+                detail=detail
+            )
+        
+        attempt = 0
+        while True:
+            timeout = policy.timeout
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats["errors"] += 1
+                    self.stats["deadline_exceeded"] += 1
+                    raise error_for(f"Update deadline exceeded: {method} {endpoint}")
+                timeout = min(timeout, remaining)
+            
+            if not breaker.allow():
+                self.stats["errors"] += 1
+                raise error_for(f"Backend is unavailable: {method} {endpoint}")
+            
+            try:
+                status, response_data = await self._attempt(method, url, data, params, timeout)
+            except aiohttp.ClientError as e:
+                breaker.record_failure()
+                error = error_for(f"Request failed: {e}")
+            except asyncio.TimeoutError:
+                # Таймаут, урезанный сроком апдейта, не говорит о проблемах backend
+                if timeout >= policy.timeout:
+                    breaker.record_failure()
+                error = error_for(f"Request timed out: {method} {endpoint}")
+            else:
+                detail = response_data.get("detail") if isinstance(response_data, dict) else None
+                if status < 500:
+                    breaker.record_success()
+                    if status < 400:
+                        return response_data
+                    self.stats["errors"] += 1
+                    error = error_for(f"API Error {status}: {detail or 'Unknown error'}", status, detail)
+                    if error.is_not_found:
+                        # Для поиска пользователя или пары 404 - обычный ответ
+                        logger.debug(f"{error} ({method} {endpoint})")
+                    else:
+                        logger.error(f"{error} ({method} {endpoint}): {response_data}")
+                    raise error
                 
-                return response_data
+                breaker.record_failure()
+                error = error_for(f"API Error {status}: {detail or 'Unknown error'}", status, detail)
+            
+            attempt += 1
+            if attempt >= policy.attempts:
+                self.stats["errors"] += 1
+                logger.error(f"{error} ({method} {endpoint}, attempts: {attempt})")
+                raise error
+            
+            delay = policy.backoff(attempt - 1)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                # Повтор уже не успеет до конца срока апдейта
+                self.stats["errors"] += 1
+                raise error
+            
+            self.stats["retries"] += 1
+            logger.warning(f"{error}, retrying {method} {endpoint} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+    
+    async def _attempt(
+        self,
+        method: str,
+        url: str,
+        data: Optional[Dict[str, Any]],
+        params: Optional[Dict[str, Any]],
+        timeout: float
+    ) -> Tuple[int, Any]:
+        """Одна попытка запроса через общий пул соединений"""
+        session = await self._ensure_session()
+        semaphore = self._semaphore
+        idle = self._idle
+        
+        counters = request_stats.get()
+        if counters is not None:
+            counters["api_calls"] += 1
+        
+        self.stats["requests"] += 1
+        self._waiting += 1
+        self.stats["max_waiting"] = max(self.stats["max_waiting"], self._waiting)
+        idle.clear()
+        queued_at = time.monotonic()
+        acquired = False
+        try:
+            async with semaphore:
+                acquired = True
+                self._waiting -= 1
+                waited = time.monotonic() - queued_at
+                self.stats["wait_time_total"] += waited
+                self.stats["wait_time_max"] = max(self.stats["wait_time_max"], waited)
                 
-        except aiohttp.ClientError as e:
-            logger.error(f"Request failed: {e}")
-            raise APIError(f"Request failed: {e}")
+                self._in_flight += 1
+                self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self._in_flight)
+                try:
+                    async with session.request(
+                        method=method,
+                        url=url,
+                        json=data,
+                        params=params,
+                        timeout=aiohttp.ClientTimeout(total=timeout)
+                    ) as response:
+                        return response.status, await response.json()
+                finally:
+                    self._in_flight -= 1
+        finally:
+            if not acquired:
+                # Задачу отменили, пока запрос ждал в очереди
+                self._waiting -= 1
+            if not self._in_flight and not self._waiting:
+                idle.set()
+    
+    async def _lookup(self, endpoint: str, load: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """GET-поиск с кэшированием отрицательного ответа
+        
+        404 запоминается на API_NEGATIVE_CACHE_TTL секунд, и повторные
+        поиски незарегистрированного пользователя (или пользователя без
+        пары) не доходят до backend. Запись сбрасывается при регистрации,
+        создании пары и присоединении к ней.
+        """
+        cached = self.not_found.get(endpoint)
+        if cached is not MISSING:
+            # Новый экземпляр, чтобы не копить traceback в закэшированном
+            raise APIError(str(cached), cached.status, cached.endpoint, 0.0, cached.detail)
+        
+        generation = self._not_found_generation
+        try:
+            return await load()
+        except APIError as e:
+            # Не кэшируем 404, если данные изменились, пока шел запрос
+            if e.is_not_found and generation == self._not_found_generation:
+                self.not_found.set(endpoint, e)
+            raise
+    
+    def _forget_not_found(self, *endpoints: str) -> None:
+        self._not_found_generation += 1
+        for endpoint in endpoints:
+            self.not_found.pop(endpoint)
     
     #* Users
     async def register_user(self, telegram_id: int, name: str, username: str = None) -> Dict[str, Any]:
@@ -61,21 +673,35 @@ class APIClient:
             "name": name,
             "username": username
         }
-        return await self._make_request("POST", "/auth/register", data=data)
+        user = await self._make_request("POST", "/auth/register", data=data)
+        self._forget_not_found(f"/users/telegram/{telegram_id}")
+        return user
     
     async def get_user(self, user_id: int) -> Dict[str, Any]:
         """Получить пользователя по ID"""
-        return await self._make_request("GET", f"/users/{user_id}")
+        return await self._make_request("GET", f"/users/{user_id}", coalesce=True)
     
     async def get_user_by_telegram_id(self, telegram_id: int) -> Dict[str, Any]:
         """Получить пользователя по Telegram ID"""
-        return await self._make_request("GET", f"/users/telegram/{telegram_id}")
+        if not settings.API_BATCH_LOOKUPS:
+            load = lambda: self._make_request("GET", f"/users/telegram/{telegram_id}", coalesce=True)
+        else:
+            load = lambda: self.user_loader.load(telegram_id)
+        return await self._lookup(f"/users/telegram/{telegram_id}", load)
+    
+    async def _bulk_users_by_telegram_id(self, telegram_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Пользователи по списку Telegram ID одним запросом"""
+        params = {"telegram_ids": ",".join(map(str, telegram_ids))}
+        users = await self._make_request("GET", "/users/telegram/", params=params)
+        return {user["telegram_id"]: user for user in users}
     
     #* Pairs
     async def create_couple(self, user_id: int) -> Dict[str, Any]:
         """Создать новую пару"""
         data = {"user_id": user_id}
-        return await self._make_request("POST", "/couples/", data=data)
+        couple = await self._make_request("POST", "/couples/", data=data)
+        self._forget_not_found(f"/couples/user/{user_id}")
+        return couple
     
     async def join_couple(self, user_id: int, invite_code: str) -> Dict[str, Any]:
         """Присоединиться к паре по коду"""
@@ -83,31 +709,89 @@ class APIClient:
             "user_id": user_id,
             "invite_code": invite_code
         }
-        return await self._make_request("POST", "/couples/join", data=data)
+        couple = await self._make_request("POST", "/couples/join", data=data)
+        self._forget_not_found(f"/couples/user/{user_id}")
+        return couple
     
     async def get_couple(self, couple_id: int) -> Dict[str, Any]:
         """Получить информацию о паре"""
-        return await self._make_request("GET", f"/couples/{couple_id}")
+        return await self._make_request("GET", f"/couples/{couple_id}", coalesce=True)
     
     async def get_couple_by_code(self, invite_code: str) -> Dict[str, Any]:
         """Получить пару по коду приглашения"""
-        return await self._make_request("GET", f"/couples/code/{invite_code}")
+        return await self._make_request("GET", f"/couples/code/{invite_code}", coalesce=True)
     
     async def get_user_couple(self, user_id: int) -> Dict[str, Any]:
         """Получить пару пользователя"""
-        return await self._make_request("GET", f"/couples/user/{user_id}")
+        if not settings.API_BATCH_LOOKUPS:
+            load = lambda: self._make_request("GET", f"/couples/user/{user_id}", coalesce=True)
+        else:
+            load = lambda: self.couple_loader.load(user_id)
+        return await self._lookup(f"/couples/user/{user_id}", load)
+    
+    async def _bulk_couples_by_user_id(self, user_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Пары по списку id пользователей одним запросом"""
+        params = {"user_ids": ",".join(map(str, user_ids))}
+        couples = await self._make_request("GET", "/couples/user/", params=params)
+        wanted = set(user_ids)
+        return {
+            user_id: couple
+            for couple in couples
+            for user_id in (couple.get("user1_id"), couple.get("user2_id"))
+            if user_id in wanted
+        }
     
     #* Ideas
-    async def get_ideas(self, category: str = None, limit: int = 10) -> List[Dict[str, Any]]:
-        """Получить список идей"""
+    # Каталог идей меняется редко, поэтому ответы на чтение кэшируются
+    # в ideas_cache и сбрасываются после успешного изменения идей
+    async def get_ideas(
+        self,
+        category: str = None,
+        limit: int = 10,
+        offset: int = 0,
+        fresh: bool = False,
+        updated_since: Optional[str] = None,
+        policy: Optional[RetryPolicy] = None
+    ) -> List[Dict[str, Any]]:
+        """Получить список идей
+        
+        fresh=True - не брать ответ из кэша и не класть его туда (для
+        синхронизации каталога). updated_since - только идеи, измененные
+        или удаленные после этого момента (ISO 8601), включая удаленные с
+        is_deleted=true. policy - политика повторов запроса.
+        """
+        key = ("ideas", category, limit, offset, updated_since)
+        if not fresh:
+            ideas = self.ideas_cache.get(key)
+            if ideas is not MISSING:
+                return ideas
+        
+        generation = self._ideas_generation
         params = {"limit": limit}
+        if offset:
+            params["offset"] = offset
         if category:
             params["category"] = category
-        return await self._make_request("GET", "/ideas/", params=params)
+        if updated_since:
+            params["updated_since"] = updated_since
+            params["include_deleted"] = "true"
+        ideas = await self._make_request("GET", "/ideas/", params=params, coalesce=True, policy=policy)
+        if not fresh and generation == self._ideas_generation:
+            self.ideas_cache.set(key, ideas)
+        return ideas
     
     async def get_idea(self, idea_id: int) -> Dict[str, Any]:
         """Получить конкретную идею"""
-        return await self._make_request("GET", f"/ideas/{idea_id}")
+        key = ("idea", idea_id)
+        idea = self.ideas_cache.get(key)
+        if idea is not MISSING:
+            return idea
+        
+        generation = self._ideas_generation
+        idea = await self._make_request("GET", f"/ideas/{idea_id}", coalesce=True)
+        if generation == self._ideas_generation:
+            self.ideas_cache.set(key, idea)
+        return idea
     
     async def create_idea(self, title: str, description: str, category: str) -> Dict[str, Any]:
         """Создать новую идею"""
@@ -116,7 +800,10 @@ class APIClient:
             "description": description,
             "category": category
         }
-        return await self._make_request("POST", "/ideas/", data=data)
+        idea = await self._make_request("POST", "/ideas/", data=data)
+        self._invalidate_ideas()
+        self._emit("idea_created", idea)
+        return idea
     
     async def update_idea(self, idea_id: int, title: str = None, description: str = None, category: str = None) -> Dict[str, Any]:
         """Обновить идею"""
@@ -128,14 +815,30 @@ class APIClient:
         if category:
             data["category"] = category
         
-        return await self._make_request("PATCH", f"/ideas/{idea_id}", data=data)
+        idea = await self._make_request("PATCH", f"/ideas/{idea_id}", data=data)
+        self._invalidate_ideas()
+        self._emit("idea_updated", idea)
+        return idea
     
     async def delete_idea(self, idea_id: int) -> Dict[str, Any]:
         """Удалить идею"""
-        return await self._make_request("DELETE", f"/ideas/{idea_id}")
+        result = await self._make_request("DELETE", f"/ideas/{idea_id}")
+        self._invalidate_ideas()
+        self._emit("idea_deleted", {"id": idea_id})
+        return result
+    
+    def _invalidate_ideas(self) -> None:
+        """Сбросить кэш идей после изменения каталога"""
+        # Ответы запросов, начатых до изменения, не попадут в кэш
+        self._ideas_generation += 1
+        self.ideas_cache.clear()
     
     async def get_random_idea(self, category: str = None) -> Dict[str, Any]:
-        """Получить случайную идею"""
+        """Получить случайную идею
+        
+        Не кэшируется и не объединяется: backend выбирает из всего
+        каталога, и каждый вызов должен давать новую идею.
+        """
         params = {"category": category} if category else {}
         return await self._make_request("GET", "/ideas/random", params=params)
     
@@ -156,7 +859,13 @@ class APIClient:
         if scheduled_date:
             data["scheduled_date"] = scheduled_date
         
-        return await self._make_request("POST", "/dates/proposal", data=data)
+        event = await self._make_request("POST", "/dates/proposal", data=data)
+        stats = self.couple_stats.get(couple_id)
+        if stats is not MISSING:
+            stats.add(event)
+        self._invalidate_history(couple_id)
+        self._emit("proposal_created", {**data, "date_status": "pending", **event, "actor_id": proposer_id})
+        return event
     
     async def respond_to_proposal(self, event_id: int, response: str, user_id: int) -> Dict[str, Any]:
         """Ответить на предложение свидания"""
@@ -165,21 +874,117 @@ class APIClient:
             "response": response,  # "accepted" или "rejected"
             "user_id": user_id
         }
-        return await self._make_request("POST", "/dates/respond", data=data)
+        event = await self._make_request("POST", "/dates/respond", data=data)
+        self._apply_status_change("pending", event)
+        self._emit("proposal_responded", {"id": event_id, "date_status": response, **data, **event, "actor_id": user_id})
+        return event
     
-    async def get_date_history(self, couple_id: int, limit: int = 20) -> List[Dict[str, Any]]:
+    async def get_date_history(self, couple_id: int, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
         """Получить историю свиданий пары"""
         params = {"limit": limit}
-        return await self._make_request("GET", f"/dates/history/{couple_id}", params=params)
+        if offset:
+            params["offset"] = offset
+        return await self._make_request("GET", f"/dates/history/{couple_id}", params=params, coalesce=True)
+    
+    async def iter_date_history(
+        self,
+        couple_id: int,
+        page_size: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Перебрать историю свиданий пары постранично
+        
+        Страницы по page_size записей запрашиваются по мере перебора, так
+        что в памяти находится не больше одной страницы. Перебор можно
+        прервать в любой момент; limit ограничивает общее число записей.
+        """
+        page_size = page_size or settings.HISTORY_STREAM_PAGE_SIZE
+        offset = 0
+        while limit is None or offset < limit:
+            size = page_size if limit is None else min(page_size, limit - offset)
+            events = await self.get_date_history(couple_id, limit=size, offset=offset)
+            for event in events:
+                yield event
+            if len(events) < size:
+                return
+            offset += size
+    
+    async def get_date_history_page(
+        self,
+        couple_id: int,
+        page: int,
+        page_size: int
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """Получить страницу истории свиданий и признак наличия следующей
+        
+        С backend запрашивается только нужная страница (плюс одна запись,
+        чтобы узнать, есть ли следующая). Страницы кэшируются в
+        history_cache до изменения истории пары.
+        """
+        key = (couple_id, self._history_version(couple_id), page, page_size)
+        cached = self.history_cache.get(key)
+        if cached is not MISSING:
+            return cached
+        
+        events = await self.get_date_history(couple_id, limit=page_size + 1, offset=page * page_size)
+        result = (events[:page_size], len(events) > page_size)
+        self.history_cache.set(key, result)
+        return result
+    
+    def _history_version(self, couple_id: int) -> Tuple[int, int]:
+        """Версия истории пары, меняется при каждом ее изменении"""
+        return self._history_epoch, self._history_versions.get(couple_id, 0)
+    
+    def _invalidate_history(self, couple_id: Optional[int]) -> None:
+        """Сбросить закэшированные страницы истории пары"""
+        if couple_id is None:
+            # Пара неизвестна - сбрасываем страницы всех пар
+            self._history_epoch += 1
+            self.history_cache.clear()
+            return
+        # Старые страницы становятся недоступны и вытесняются по LRU
+        self._history_versions[couple_id] = self._history_versions.get(couple_id, 0) + 1
+    
+    def _apply_status_change(self, old_status: str, event: Dict[str, Any]) -> None:
+        """Обновить статистику и кэш истории после смены статуса события"""
+        couple_id = event.get("couple_id")
+        if couple_id is None:
+            # Не знаем, чью статистику править - пересчитаем при запросе
+            self.couple_stats.clear()
+        else:
+            stats = self.couple_stats.get(couple_id)
+            if stats is not MISSING:
+                stats.change_status(old_status, event)
+        self._invalidate_history(couple_id)
+    
+    async def get_couple_stats(self, couple_id: int) -> CoupleStats:
+        """Получить статистику свиданий пары
+        
+        При первом запросе история читается целиком постранично, дальше
+        статистика обновляется вместе с изменениями свиданий.
+        """
+        stats = self.couple_stats.get(couple_id)
+        if stats is not MISSING:
+            return stats
+        
+        version = self._history_version(couple_id)
+        stats = CoupleStats()
+        async for event in self.iter_date_history(couple_id, page_size=settings.STATS_PAGE_SIZE):
+            stats.add(event)
+        
+        # Если история менялась во время подсчета, результат мог устареть
+        if version == self._history_version(couple_id):
+            self.couple_stats.set(couple_id, stats)
+        return stats
     
     async def get_date_event(self, event_id: int) -> Dict[str, Any]:
         """Получить конкретное событие"""
-        return await self._make_request("GET", f"/dates/{event_id}")
+        return await self._make_request("GET", f"/dates/{event_id}", coalesce=True)
     
     async def get_pending_proposals(self, couple_id: int) -> List[Dict[str, Any]]:
         """Получить ожидающие предложения"""
         params = {"status": "pending"}
-        return await self._make_request("GET", f"/dates/couple/{couple_id}", params=params)
+        return await self._make_request("GET", f"/dates/couple/{couple_id}", params=params, coalesce=True)
     
     async def mark_date_completed(self, event_id: int, user_id: int) -> Dict[str, Any]:
         """Отметить свидание как завершенное"""
@@ -187,87 +992,111 @@ class APIClient:
             "event_id": event_id,
             "user_id": user_id
         }
-        return await self._make_request("POST", "/dates/complete", data=data)
+        event = await self._make_request("POST", "/dates/complete", data=data)
+        self._apply_status_change("accepted", event)
+        self._emit("date_completed", {"id": event_id, "date_status": "completed", **data, **event, "actor_id": user_id})
+        return event
 
 
 class APIError(Exception):
-    """Исключение для ошибок API"""
-    pass
+    """Исключение для ошибок API
+    
+    status - HTTP-статус ответа backend (None, если ответа не было:
+    сбой соединения, таймаут, разомкнутый circuit breaker), endpoint -
+    "METHOD /path", latency - сколько секунд занял вызов вместе с
+    повторами, detail - поле detail из ответа backend.
+    """
+    
+    def __init__(
+        self,
+        message: str,
+        status: Optional[int] = None,
+        endpoint: Optional[str] = None,
+        latency: Optional[float] = None,
+        detail: Any = None
+    ):
+        super().__init__(message)
+        self.status = status
+        self.endpoint = endpoint
+        self.latency = latency
+        self.detail = detail
+    
+    @property
+    def is_not_found(self) -> bool:
+        return self.status == 404
 
 
 # Глобальный экземпляр клиента
 api_client = APIClient()
 
 # Функции-обертки для совместимости с текущим кодом handlers
-async def get_ideas(category: str = None, limit: int = 10) -> List[Dict[str, Any]]:
+async def get_ideas(category: str = None, limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
     """Получить список идей"""
-    async with api_client as client:
-        return await client.get_ideas(category, limit)
+    return await api_client.get_ideas(category, limit, offset)
 
 async def add_idea(title: str, description: str, category: str) -> Dict[str, Any]:
     """Добавить новую идею"""
-    async with api_client as client:
-        return await client.create_idea(title, description, category)
+    return await api_client.create_idea(title, description, category)
 
 async def update_idea(idea_id: int, title: str = None, description: str = None, category: str = None) -> Dict[str, Any]:
     """Обновить идею"""
-    async with api_client as client:
-        return await client.update_idea(idea_id, title, description, category)
+    return await api_client.update_idea(idea_id, title, description, category)
 
 async def delete_idea(idea_id: int) -> Dict[str, Any]:
     """Удалить идею"""
-    async with api_client as client:
-        return await client.delete_idea(idea_id)
+    return await api_client.delete_idea(idea_id)
 
 async def get_random_idea(category: str = None) -> Dict[str, Any]:
     """Получить случайную идею"""
-    async with api_client as client:
-        return await client.get_random_idea(category)
+    return await api_client.get_random_idea(category)
 
 # Функции-обертки для работы с пользователями
 async def register_user(telegram_id: int, name: str, username: str = None) -> Dict[str, Any]:
     """Регистрация нового пользователя"""
-    async with api_client as client:
-        return await client.register_user(telegram_id, name, username)
+    return await api_client.register_user(telegram_id, name, username)
 
 async def get_user_by_telegram_id(telegram_id: int) -> Dict[str, Any]:
     """Получить пользователя по Telegram ID"""
-    async with api_client as client:
-        return await client.get_user_by_telegram_id(telegram_id)
+    return await api_client.get_user_by_telegram_id(telegram_id)
 
 # Функции-обертки для работы с парами
 async def create_couple(user_id: int) -> Dict[str, Any]:
     """Создать новую пару"""
-    async with api_client as client:
-        return await client.create_couple(user_id)
+    return await api_client.create_couple(user_id)
 
 async def join_couple(user_id: int, invite_code: str) -> Dict[str, Any]:
     """Присоединиться к паре по коду"""
-    async with api_client as client:
-        return await client.join_couple(user_id, invite_code)
+    return await api_client.join_couple(user_id, invite_code)
 
 async def get_user_couple(user_id: int) -> Dict[str, Any]:
     """Получить пару пользователя"""
-    async with api_client as client:
-        return await client.get_user_couple(user_id)
+    return await api_client.get_user_couple(user_id)
 
 # Функции-обертки для работы с событиями/свиданиями
 async def create_date_proposal(couple_id: int, idea_id: int, proposer_id: int, scheduled_date: str = None) -> Dict[str, Any]:
     """Создать предложение свидания"""
-    async with api_client as client:
-        return await client.create_date_proposal(couple_id, idea_id, proposer_id, scheduled_date)
+    return await api_client.create_date_proposal(couple_id, idea_id, proposer_id, scheduled_date)
 
 async def respond_to_proposal(event_id: int, response: str, user_id: int) -> Dict[str, Any]:
     """Ответить на предложение свидания"""
-    async with api_client as client:
-        return await client.respond_to_proposal(event_id, response, user_id)
+    return await api_client.respond_to_proposal(event_id, response, user_id)
 
-async def get_date_history(couple_id: int, limit: int = 20) -> List[Dict[str, Any]]:
+async def get_date_history(couple_id: int, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
     """Получить историю свиданий пары"""
-    async with api_client as client:
-        return await client.get_date_history(couple_id, limit)
+    return await api_client.get_date_history(couple_id, limit, offset)
+
+def iter_date_history(couple_id: int, page_size: Optional[int] = None, limit: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Перебрать историю свиданий пары постранично"""
+    return api_client.iter_date_history(couple_id, page_size, limit)
+
+async def get_date_history_page(couple_id: int, page: int, page_size: int) -> Tuple[List[Dict[str, Any]], bool]:
+    """Получить страницу истории свиданий и признак наличия следующей"""
+    return await api_client.get_date_history_page(couple_id, page, page_size)
+
+async def get_date_event(event_id: int) -> Dict[str, Any]:
+    """Получить конкретное событие"""
+    return await api_client.get_date_event(event_id)
 
 async def get_pending_proposals(couple_id: int) -> List[Dict[str, Any]]:
     """Получить ожидающие предложения"""
-    async with api_client as client:
-        return await client.get_pending_proposals(couple_id)
\ No newline at end of file
+    return await api_client.get_pending_proposals(couple_id)
\ No newline at end of file
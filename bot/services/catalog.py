@@ -0,0 +1,199 @@
+import random
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+from loguru import logger
+
+from services.api_client import api_client
+
+
+# Слушатель изменений каталога: (добавленные/обновленные идеи, id удаленных)
+CatalogListener = Callable[[List[Dict[str, Any]], List[int]], None]
+
+
+class _IdList:
+    """Список id с удалением и случайным выбором за O(1)"""
+
+    __slots__ = ("items", "positions")
+
+    def __init__(self):
+        self.items: List[int] = []
+        self.positions: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def add(self, idea_id: int) -> None:
+        if idea_id not in self.positions:
+            self.positions[idea_id] = len(self.items)
+            self.items.append(idea_id)
+
+    def remove(self, idea_id: int) -> None:
+        position = self.positions.pop(idea_id, None)
+        if position is None:
+            return
+        # Переносим последний элемент на место удаленного
+        last = self.items.pop()
+        if last != idea_id:
+            self.items[position] = last
+            self.positions[last] = position
+
+    def choice(self) -> Optional[int]:
+        return random.choice(self.items) if self.items else None
+
+
+class IdeaCatalog:
+    """Локальная копия каталога идей, разбитая по категориям
+
+    Хранит идеи по id, а для каждой категории - отдельный список id, что
+    дает случайный выбор по категории и счетчики категорий без обращения
+    к backend. Каталог загружается целиком при запуске, а затем
+    поддерживается в актуальном состоянии через upsert()/remove().
+    """
+
+    def __init__(self):
+        self._ideas: Dict[int, Dict[str, Any]] = {}
+        self._all = _IdList()
+        self._by_category: Dict[str, _IdList] = {}
+        self._listeners: List[CatalogListener] = []
+        self.version = 0
+        self.loaded_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._ideas)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def get(self, idea_id: int) -> Optional[Dict[str, Any]]:
+        return self._ideas.get(idea_id)
+
+    def all(self) -> List[Dict[str, Any]]:
+        return list(self._ideas.values())
+
+    def ids(self, category: Optional[str] = None) -> List[int]:
+        """Копия списка id идей (всех или одной категории)"""
+        id_list = self._all if category is None else self._by_category.get(category)
+        return list(id_list.items) if id_list else []
+
+    def category_counts(self) -> Dict[str, int]:
+        """Число идей в каждой категории"""
+        return {category: len(ids) for category, ids in self._by_category.items()}
+
+    def random(self, category: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Случайная идея (из категории, если она указана)"""
+        id_list = self._all if category is None else self._by_category.get(category)
+        idea_id = id_list.choice() if id_list else None
+        return self._ideas.get(idea_id) if idea_id is not None else None
+
+    def add_listener(self, listener: CatalogListener) -> None:
+        """Подписаться на изменения каталога"""
+        self._listeners.append(listener)
+
+    def replace_all(self, ideas: Iterable[Dict[str, Any]]) -> None:
+        """Заменить каталог целиком"""
+        removed = list(self._ideas)
+        self._ideas.clear()
+        self._all = _IdList()
+        self._by_category.clear()
+        upserted = [idea for idea in ideas if self._put(idea)]
+        self.loaded_at = time.monotonic()
+        self._changed(upserted, removed)
+
+    def apply(self, upserted: Iterable[Dict[str, Any]] = (), removed: Iterable[int] = ()) -> None:
+        """Применить изменения: добавить/обновить и удалить идеи"""
+        upserted = [idea for idea in upserted if self._put(idea)]
+        removed = [idea_id for idea_id in removed if self._drop(idea_id)]
+        if upserted or removed:
+            self._changed(upserted, removed)
+
+    def upsert(self, idea: Dict[str, Any]) -> None:
+        self.apply(upserted=[idea])
+
+    def remove(self, idea_id: int) -> None:
+        self.apply(removed=[idea_id])
+
+    def _put(self, idea: Dict[str, Any]) -> bool:
+        idea_id = idea.get("id")
+        if idea_id is None:
+            return False
+        self._drop(idea_id)
+        self._ideas[idea_id] = idea
+        self._all.add(idea_id)
+        category = idea.get("category")
+        if category:
+            self._by_category.setdefault(category, _IdList()).add(idea_id)
+        return True
+
+    def _drop(self, idea_id: int) -> bool:
+        idea = self._ideas.pop(idea_id, None)
+        if idea is None:
+            return False
+        self._all.remove(idea_id)
+        category = idea.get("category")
+        id_list = self._by_category.get(category)
+        if id_list is not None:
+            id_list.remove(idea_id)
+            if not id_list:
+                del self._by_category[category]
+        return True
+
+    def _changed(self, upserted: List[Dict[str, Any]], removed: List[int]) -> None:
+        self.version += 1
+        for listener in self._listeners:
+            try:
+                listener(upserted, removed)
+            except Exception as e:
+                logger.exception(f"Catalog listener failed: {e}")
+
+
+class ShuffleBag:
+    """Выбор идей без повторов для каждой пары
+
+    Для пары и категории хранится перемешанная колода id; идея снова
+    выпадет только после того, как будут показаны все остальные.
+    """
+
+    def __init__(self, catalog: IdeaCatalog, max_bags: int = 10000):
+        self.catalog = catalog
+        self.max_bags = max_bags
+        self._bags: "OrderedDict[Hashable, List[int]]" = OrderedDict()
+
+    def draw(self, owner: Hashable, category: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Следующая идея для owner (обычно id пары)"""
+        key = (owner, category)
+        bag = self._bags.pop(key, None) or []
+        refilled = False
+        try:
+            while True:
+                if not bag:
+                    if refilled:
+                        return None
+                    bag = self.catalog.ids(category)
+                    random.shuffle(bag)
+                    refilled = True
+                    if not bag:
+                        return None
+
+                idea = self.catalog.get(bag.pop())
+                # Идею могли удалить или перенести в другую категорию
+                if idea and (category is None or idea.get("category") == category):
+                    return idea
+        finally:
+            if bag:
+                self._bags[key] = bag
+                while len(self._bags) > self.max_bags:
+                    self._bags.popitem(last=False)
+
+
+idea_catalog = IdeaCatalog()
+shuffle_bag = ShuffleBag(idea_catalog)
+
+
+def setup_catalog() -> None:
+    """Поддерживать каталог в актуальном состоянии при изменении идей ботом"""
+    api_client.subscribe("idea_created", idea_catalog.upsert)
+    api_client.subscribe("idea_updated", idea_catalog.upsert)
+    api_client.subscribe("idea_deleted", lambda idea: idea_catalog.remove(idea["id"]))
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from config import settings
+from services.api_client import BACKGROUND_RETRY, APIClient, APIError, api_client
+from services.catalog import IdeaCatalog, idea_catalog
+
+
+class CatalogSyncer:
+    """Фоновая синхронизация локального каталога идей с backend
+
+    Первая синхронизация загружает каталог целиком. Дальше каждые
+    interval секунд запрашиваются только идеи, измененные после
+    водяного знака (максимального updated_at из уже полученных), вместе с
+    удаленными (is_deleted). Изменения применяются к каталогу одним
+    синхронным вызовом, поэтому обработчики не видят каталог наполовину
+    обновленным. Раз в full_interval секунд каталог перезагружается целиком
+    на случай пропущенных удалений; если backend не отдает updated_at,
+    каждая синхронизация будет полной.
+    """
+
+    def __init__(
+        self,
+        catalog: IdeaCatalog,
+        client: APIClient,
+        interval: float,
+        full_interval: float,
+        page_size: int
+    ):
+        self.catalog = catalog
+        self.client = client
+        self.interval = interval
+        self.full_interval = full_interval
+        self.page_size = page_size
+        self.watermark: Optional[str] = None
+        self._full_synced_at: Optional[float] = None
+        self._synced_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "full_syncs": 0,
+            "delta_syncs": 0,
+            "failures": 0,
+            "changed": 0,
+            "deleted": 0,
+            "last_payload_items": 0,
+            "last_payload_bytes": 0,
+            "payload_bytes_total": 0,
+        }
+
+    async def sync(self) -> None:
+        """Выполнить очередную синхронизацию (полную или по изменениям)"""
+        full_due = (
+            self._full_synced_at is None
+            or time.monotonic() - self._full_synced_at >= self.full_interval
+        )
+        if self.watermark is None or full_due:
+            await self.full_sync()
+        else:
+            await self.delta_sync()
+
+    async def full_sync(self) -> None:
+        """Загрузить каталог целиком"""
+        ideas, size = await self._fetch()
+        live = [idea for idea in ideas if not idea.get("is_deleted")]
+        self.catalog.replace_all(live)
+
+        self.watermark = self._max_updated_at(ideas, None)
+        self._full_synced_at = self._synced_at = time.monotonic()
+        self._record_payload(len(ideas), size)
+        self.stats["full_syncs"] += 1
+        logger.info(
+            f"Idea catalog loaded: {len(self.catalog)} ideas, {size} bytes, "
+            f"categories {self.catalog.category_counts()}"
+        )
+
+    async def delta_sync(self) -> None:
+        """Загрузить и применить изменения после водяного знака"""
+        ideas, size = await self._fetch(updated_since=self.watermark)
+        changed = [idea for idea in ideas if not idea.get("is_deleted")]
+        deleted = [idea["id"] for idea in ideas if idea.get("is_deleted")]
+        self.catalog.apply(changed, deleted)
+
+        self.watermark = self._max_updated_at(ideas, self.watermark)
+        self._synced_at = time.monotonic()
+        self._record_payload(len(ideas), size)
+        self.stats["delta_syncs"] += 1
+        self.stats["changed"] += len(changed)
+        self.stats["deleted"] += len(deleted)
+        if ideas:
+            logger.info(f"Idea catalog synced: {len(changed)} changed, {len(deleted)} deleted")
+
+    async def _fetch(self, updated_since: Optional[str] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Загрузить все страницы ответа и посчитать объем данных"""
+        ideas: List[Dict[str, Any]] = []
+        size = 0
+        offset = 0
+        while True:
+            page = await self.client.get_ideas(
+                limit=self.page_size,
+                offset=offset,
+                fresh=True,
+                updated_since=updated_since,
+                policy=BACKGROUND_RETRY
+            )
+            ideas.extend(page)
+            size += len(json.dumps(page, ensure_ascii=False).encode())
+            if len(page) < self.page_size:
+                return ideas, size
+            offset += self.page_size
+
+    @staticmethod
+    def _max_updated_at(ideas: List[Dict[str, Any]], current: Optional[str]) -> Optional[str]:
+        # Даты в ISO 8601 в одном формате сравниваются как строки
+        stamps = [idea["updated_at"] for idea in ideas if idea.get("updated_at")]
+        if current:
+            stamps.append(current)
+        return max(stamps) if stamps else None
+
+    def _record_payload(self, items: int, size: int) -> None:
+        self.stats["last_payload_items"] = items
+        self.stats["last_payload_bytes"] = size
+        self.stats["payload_bytes_total"] += size
+
+    async def start(self) -> None:
+        """Запустить фоновую синхронизацию; первая загружает каталог
+
+        Запуск бота загрузку не ждет: пока каталог не загружен, бот
+        работает без него, и идеи берутся из API.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить фоновую синхронизацию"""
+        task, self._task = self._task, None
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sync()
+            except APIError as e:
+                self.stats["failures"] += 1
+                logger.warning(f"Idea catalog sync failed: {e}")
+            except Exception as e:
+                # Неожиданная ошибка не должна навсегда останавливать синхронизацию
+                self.stats["failures"] += 1
+                logger.exception(f"Idea catalog sync failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Метрики синхронизации: отставание и объем данных"""
+        lag = time.monotonic() - self._synced_at if self._synced_at is not None else None
+        return {
+            **self.stats,
+            "ideas": len(self.catalog),
+            "watermark": self.watermark,
+            "sync_lag": lag,
+        }
+
+
+catalog_syncer = CatalogSyncer(
+    catalog=idea_catalog,
+    client=api_client,
+    interval=settings.CATALOG_SYNC_INTERVAL,
+    full_interval=settings.CATALOG_FULL_SYNC_INTERVAL,
+    page_size=settings.CATALOG_PAGE_SIZE
+)
@@ -0,0 +1,115 @@
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from config import settings
+from services.api_client import api_client, APIError
+from services.cache import TTLCache, MISSING
+
+
+# Пользователь по telegram_id; отсутствие пользователя кэширует APIClient.not_found
+user_cache = TTLCache(settings.CONTEXT_CACHE_SIZE, settings.CONTEXT_CACHE_TTL)
+
+# Пара по id пользователя; отсутствие пары кэширует APIClient.not_found
+couple_cache = TTLCache(settings.CONTEXT_CACHE_SIZE, settings.CONTEXT_CACHE_TTL)
+
+
+def invalidate_user(telegram_id: int) -> None:
+    """Сбросить закэшированного пользователя (например, после регистрации)"""
+    user_cache.pop(telegram_id)
+
+
+def invalidate_couple(*user_ids: Optional[int]) -> None:
+    """Сбросить закэшированную пару для перечисленных пользователей"""
+    for user_id in user_ids:
+        if user_id is not None:
+            couple_cache.pop(user_id)
+
+
+class UserContext:
+    """Пользователь и пара автора апдейта, загружаемые по требованию
+
+    Создается AuthMiddleware на каждый апдейт и передается обработчикам
+    как ctx. Данные запрашиваются у backend только при первом обращении к
+    get_user() / get_couple() и запоминаются до конца обработки апдейта,
+    поэтому обработчики не должны запрашивать их повторно.
+
+    stats["api_calls"] - число запросов к backend за время апдейта.
+    """
+
+    def __init__(self, telegram_id: int, username: Optional[str], full_name: str):
+        self.telegram_id = telegram_id
+        self.username = username
+        self.full_name = full_name
+        self.api_error: Optional[str] = None
+        self.stats: Dict[str, int] = {"api_calls": 0}
+        self._user: Any = MISSING
+        self._couple: Any = MISSING
+
+    @property
+    def user_info(self) -> Dict[str, Any]:
+        """Данные Telegram-профиля для регистрации"""
+        return {
+            "telegram_id": self.telegram_id,
+            "username": self.username,
+            "full_name": self.full_name
+        }
+
+    async def get_user(self) -> Optional[Dict[str, Any]]:
+        """Пользователь backend или None, если он не зарегистрирован"""
+        if self._user is MISSING:
+            self._user = await self._load_user()
+        return self._user
+
+    async def get_couple(self) -> Optional[Dict[str, Any]]:
+        """Пара пользователя или None, если пары нет"""
+        if self._couple is MISSING:
+            user = await self.get_user()
+            self._couple = await self._load_couple(user["id"]) if user else None
+        return self._couple
+
+    @property
+    def api_calls(self) -> int:
+        """Число запросов к backend в рамках апдейта"""
+        return self.stats["api_calls"]
+
+    async def _load_user(self) -> Optional[Dict[str, Any]]:
+        telegram_id = self.telegram_id
+        user_data = user_cache.get(telegram_id)
+        if user_data is not MISSING:
+            return user_data
+
+        try:
+            user_data = await api_client.get_user_by_telegram_id(telegram_id)
+            user_cache.set(telegram_id, user_data)
+            logger.info(f"User {telegram_id} authenticated successfully")
+            return user_data
+        except APIError as e:
+            # Пользователь не найден или другая ошибка
+            if e.is_not_found:
+                # Пользователь не зарегистрирован; повторные поиски
+                # отвечает отрицательный кэш APIClient
+                logger.info(f"User {telegram_id} not registered yet")
+            else:
+                # Другая ошибка API
+                logger.error(f"API error for user {telegram_id}: {e}")
+                self.api_error = str(e)
+            return None
+
+    async def _load_couple(self, user_id: int) -> Optional[Dict[str, Any]]:
+        couple_data = couple_cache.get(user_id)
+        if couple_data is not MISSING:
+            return couple_data
+
+        try:
+            couple_data = await api_client.get_user_couple(user_id)
+            couple_cache.set(user_id, couple_data)
+            logger.info(f"User {self.telegram_id} has couple {couple_data.get('id')}")
+            return couple_data
+        except APIError as e:
+            if e.is_not_found:
+                # У пользователя нет пары
+                logger.info(f"User {self.telegram_id} has no couple")
+            else:
+                logger.error(f"Error getting couple for user {self.telegram_id}: {e}")
+            return None
@@ -0,0 +1,160 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Set
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardMarkup
+from loguru import logger
+
+from config import settings
+from keyboards.inline import proposal_response_keyboard
+from middlewares.outbound import bulk_lane
+from services.api_client import APIClient, APIError, api_client, spawn_detached
+from services.cache import TTLCache, MISSING
+from services.catalog import idea_catalog
+
+
+def _idea_title(event: Dict[str, Any]) -> str:
+    idea = event.get("idea") or idea_catalog.get(event.get("idea_id")) or {}
+    return idea.get("title", "Неизвестная идея")
+
+
+def _event_text(kind: str, event: Dict[str, Any]) -> str:
+    title = _idea_title(event)
+    if kind == "proposal_created":
+        date = event.get("scheduled_date")
+        return f"💌 Партнер предлагает свидание: *{title}*" + (f"\n📅 {date}" if date else "")
+    if kind == "proposal_responded":
+        if event.get("date_status") == "accepted":
+            return f"✅ Партнер принял ваше предложение: *{title}*"
+        return f"❌ Партнер отклонил ваше предложение: *{title}*"
+    return f"🎉 Свидание *{title}* отмечено как состоявшееся"
+
+
+class PartnerNotifier:
+    """Уведомления партнеру об изменениях свиданий
+
+    Подписывается на события APIClient (proposal_created,
+    proposal_responded, date_completed), находит Telegram ID партнера
+    того, кто совершил действие, и отправляет ему сообщение. События для
+    одного партнера за window секунд объединяются в одно сообщение.
+    Сообщения идут через низкоприоритетную очередь исходящих запросов.
+    """
+
+    def __init__(self, client: APIClient, window: float, partner_cache_ttl: float):
+        self.client = client
+        self.window = window
+        self.bot: Optional[Bot] = None
+        # (couple_id, id автора действия) -> Telegram ID партнера
+        self.partners = TTLCache(settings.CONTEXT_CACHE_SIZE, partner_cache_ttl)
+        self._pending: Dict[int, List[tuple]] = {}
+        self._flushers: Dict[int, asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.stats = {
+            "events": 0,
+            "messages": 0,
+            "coalesced": 0,
+            "failures": 0,
+        }
+
+    def setup(self, bot: Bot) -> None:
+        """Привязать бота и подписаться на события свиданий"""
+        self.bot = bot
+        for kind in ("proposal_created", "proposal_responded", "date_completed"):
+            self.client.subscribe(kind, lambda event, kind=kind: self.notify(kind, event))
+
+    def notify(self, kind: str, event: Dict[str, Any]) -> None:
+        """Слушатель событий APIClient: доставка идет в фоне"""
+        if self.bot is None:
+            return
+        self.stats["events"] += 1
+        spawn_detached(self._enqueue(kind, event), self._tasks)
+
+    async def _enqueue(self, kind: str, event: Dict[str, Any]) -> None:
+        try:
+            chat_id = await self._partner_chat_id(event)
+        except APIError as e:
+            self.stats["failures"] += 1
+            logger.warning(f"Failed to resolve partner for {kind} {event.get('id')}: {e}")
+            return
+        if chat_id is None:
+            return
+
+        self._pending.setdefault(chat_id, []).append((kind, event))
+        if chat_id not in self._flushers:
+            self._flushers[chat_id] = asyncio.create_task(self._flush_later(chat_id))
+
+    async def _partner_chat_id(self, event: Dict[str, Any]) -> Optional[int]:
+        """Telegram ID партнера автора события"""
+        # proposer_id в событии - автор предложения, а не ответивший на него
+        actor_id = event["actor_id"]
+        couple_id = event.get("couple_id")
+        if couple_id is None:
+            couple_id = (await self.client.get_date_event(event["id"])).get("couple_id")
+
+        key = (couple_id, actor_id)
+        chat_id = self.partners.get(key)
+        if chat_id is not MISSING:
+            return chat_id
+
+        couple = await self.client.get_couple(couple_id)
+        partner_id = next(
+            (user_id for user_id in (couple.get("user1_id"), couple.get("user2_id")) if user_id and user_id != actor_id),
+            None
+        )
+        if partner_id is None:
+            # Партнер еще не присоединился к паре - не кэшируем
+            return None
+        chat_id = (await self.client.get_user(partner_id)).get("telegram_id")
+        self.partners.set(key, chat_id)
+        return chat_id
+
+    async def _flush_later(self, chat_id: int) -> None:
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            # При остановке накопленное отправляется сразу
+            self._flushers.pop(chat_id, None)
+            await self._send(chat_id, self._pending.pop(chat_id, []))
+
+    async def _send(self, chat_id: int, events: List[tuple]) -> None:
+        if not events:
+            return
+
+        pending = [event for kind, event in events if kind == "proposal_created"]
+        reply_markup: Optional[InlineKeyboardMarkup] = None
+        if len(pending) == 1:
+            reply_markup = proposal_response_keyboard(pending[0]["id"])
+
+        if len(events) == 1:
+            text = _event_text(*events[0])
+        else:
+            self.stats["coalesced"] += len(events) - 1
+            text = "🔔 *Новости от партнера:*\n\n" + "\n".join(_event_text(kind, event) for kind, event in events)
+            if len(pending) > 1:
+                text += "\n\nОтветить на предложения можно в разделе «📋 Мои предложения»"
+
+        try:
+            with bulk_lane():
+                await self.bot.send_message(chat_id, text, parse_mode="Markdown", reply_markup=reply_markup)
+            self.stats["messages"] += 1
+        except Exception as e:
+            self.stats["failures"] += 1
+            logger.warning(f"Failed to notify partner {chat_id}: {e}")
+
+    async def stop(self) -> None:
+        """Отправить накопленные уведомления и дождаться фоновых задач"""
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        flushers = list(self._flushers.values())
+        for task in flushers:
+            task.cancel()
+        await asyncio.gather(*flushers, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "waiting": sum(len(events) for events in self._pending.values())}
+
+
+partner_notifier = PartnerNotifier(
+    api_client,
+    window=settings.NOTIFY_COALESCE_WINDOW,
+    partner_cache_ttl=settings.CONTEXT_CACHE_TTL
+)
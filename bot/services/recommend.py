@@ -0,0 +1,242 @@
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+from loguru import logger
+
+from config import settings
+from services.api_client import api_client
+from services.cache import TTLCache, MISSING
+from services.catalog import IdeaCatalog, idea_catalog
+
+
+# Штрафы за идеи, которые пара уже видела
+PROPOSED_PENALTY = 1.0
+REJECTED_PENALTY = 2.0
+COMPLETED_PENALTY = 3.0
+
+
+def _event_idea_id(event: Dict[str, Any]) -> Optional[int]:
+    return event.get("idea_id") or (event.get("idea") or {}).get("id")
+
+
+class CoupleFeatures:
+    """Признаки пары для рекомендаций
+
+    counts - сколько раз пара выбирала каждую категорию, penalties -
+    накопленный штраф идей, которые пара уже предлагала, отклоняла или
+    проводила, shown - идеи, уже показанные паре (по фильтру категории).
+    Векторы для каталога строятся лениво и пересобираются, только когда
+    меняются признаки или каталог.
+    """
+
+    __slots__ = ("counts", "penalties", "shown", "_built_for", "category_boost", "penalty_positions", "penalty_values")
+
+    def __init__(self):
+        self.counts: Dict[str, float] = {}
+        self.penalties: Dict[int, float] = {}
+        self.shown: Dict[Optional[str], Set[int]] = {}
+        self._built_for: Optional[int] = None
+        self.category_boost: Optional[np.ndarray] = None
+        self.penalty_positions: Optional[np.ndarray] = None
+        self.penalty_values: Optional[np.ndarray] = None
+
+    def record(self, category: Optional[str], idea_id: Optional[int], penalty: float, counted: bool) -> None:
+        if counted and category:
+            self.counts[category] = self.counts.get(category, 0.0) + 1.0
+        if idea_id is not None and penalty:
+            self.penalties[idea_id] = self.penalties.get(idea_id, 0.0) + penalty
+        self._built_for = None
+
+
+class IdeaRecommender:
+    """Выбор идей для пары по скорингу всего каталога
+
+    score = boost / (1 + выборов категории парой) - штраф идеи + шум.
+    Недоиспользованные категории получают прибавку, недавно предложенные,
+    отклоненные и проведенные идеи - штраф, шум дает разнообразие.
+    Скоринг выполняется операциями NumPy над массивами всего каталога.
+    pick() не повторяет идеи: показанная идея снова выпадет только после
+    того, как пара увидит все остальные идеи категории.
+    """
+
+    def __init__(
+        self,
+        catalog: IdeaCatalog,
+        category_boost: float = 1.0,
+        exploration: float = 0.3,
+        max_couples: int = 10000,
+        features_ttl: float = 86400.0
+    ):
+        self.catalog = catalog
+        self.category_boost = category_boost
+        self.exploration = exploration
+        self.features = TTLCache(max_couples, features_ttl)
+        self._rng = np.random.default_rng()
+
+        self._catalog_version: Optional[int] = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._category_index = np.empty(0, dtype=np.int32)
+        self._categories: List[str] = []
+        self._category_positions: Dict[str, int] = {}
+        self._positions: Dict[int, int] = {}
+
+    def _refresh_catalog(self) -> None:
+        """Пересобрать массивы каталога, если он изменился"""
+        if self._catalog_version == self.catalog.version:
+            return
+
+        ideas = self.catalog.all()
+        self._categories = sorted({idea.get("category") or "" for idea in ideas})
+        self._category_positions = {category: i for i, category in enumerate(self._categories)}
+        self._ids = np.fromiter((idea["id"] for idea in ideas), dtype=np.int64, count=len(ideas))
+        self._category_index = np.fromiter(
+            (self._category_positions[idea.get("category") or ""] for idea in ideas),
+            dtype=np.int32,
+            count=len(ideas)
+        )
+        self._positions = {int(idea_id): i for i, idea_id in enumerate(self._ids)}
+        self._catalog_version = self.catalog.version
+
+    def _vectors(self, features: CoupleFeatures) -> CoupleFeatures:
+        """Векторы признаков пары под текущий каталог"""
+        if features._built_for == self._catalog_version:
+            return features
+
+        counts = np.fromiter(
+            (features.counts.get(category, 0.0) for category in self._categories),
+            dtype=np.float32,
+            count=len(self._categories)
+        )
+        features.category_boost = self.category_boost / (1.0 + counts)
+
+        pairs = [
+            (self._positions[idea_id], penalty)
+            for idea_id, penalty in features.penalties.items()
+            if idea_id in self._positions
+        ]
+        features.penalty_positions = np.fromiter((p for p, _ in pairs), dtype=np.int64, count=len(pairs))
+        features.penalty_values = np.fromiter((v for _, v in pairs), dtype=np.float32, count=len(pairs))
+        features._built_for = self._catalog_version
+        return features
+
+    def _scores(self, features: CoupleFeatures, category: Optional[str]) -> np.ndarray:
+        self._vectors(features)
+        scores = features.category_boost[self._category_index]
+        scores[features.penalty_positions] -= features.penalty_values
+        scores += self.exploration * self._rng.random(len(scores), dtype=np.float32)
+        if category is not None:
+            position = self._category_positions.get(category)
+            if position is None:
+                scores[:] = -np.inf
+            else:
+                scores[self._category_index != position] = -np.inf
+        return scores
+
+    def top(self, features: CoupleFeatures, limit: int, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Лучшие limit идей для пары (по убыванию оценки)"""
+        self._refresh_catalog()
+        if not len(self._ids):
+            return []
+
+        scores = self._scores(features, category)
+        limit = min(limit, len(scores))
+        best = np.argpartition(-scores, limit - 1)[:limit]
+        best = best[np.argsort(-scores[best])]
+        return [
+            self.catalog.get(int(self._ids[i]))
+            for i in best
+            if np.isfinite(scores[i])
+        ]
+
+    def pick(self, features: CoupleFeatures, category: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Одна рекомендованная идея для пары"""
+        self._refresh_catalog()
+        if not len(self._ids):
+            return None
+
+        scores = self._scores(features, category)
+        shown = features.shown.setdefault(category, set())
+        positions = [self._positions[idea_id] for idea_id in shown if idea_id in self._positions]
+        if positions:
+            unseen = scores.copy()
+            unseen[positions] = -np.inf
+            if np.isfinite(unseen).any():
+                scores = unseen
+            else:
+                # Пара видела все идеи категории - начинаем новый круг
+                shown.clear()
+
+        best = int(np.argmax(scores))
+        if not np.isfinite(scores[best]):
+            return None
+        idea_id = int(self._ids[best])
+        shown.add(idea_id)
+        return self.catalog.get(idea_id)
+
+    async def get_features(self, couple_id: int) -> CoupleFeatures:
+        """Признаки пары; при первом обращении строятся по истории свиданий"""
+        features = self.features.get(couple_id)
+        if features is not MISSING:
+            return features
+
+        features = CoupleFeatures()
+        history = api_client.iter_date_history(couple_id, limit=settings.RECOMMEND_HISTORY_LIMIT)
+        async for event in history:
+            self._record(features, event, event.get("date_status", "pending"), counted=True)
+        self.features.set(couple_id, features)
+        return features
+
+    def _record(self, features: CoupleFeatures, event: Dict[str, Any], status: str, counted: bool) -> None:
+        idea_id = _event_idea_id(event)
+        idea = self.catalog.get(idea_id) if idea_id is not None else None
+        category = (idea or event.get("idea") or {}).get("category")
+        penalty = {
+            "pending": PROPOSED_PENALTY,
+            "accepted": PROPOSED_PENALTY,
+            "rejected": REJECTED_PENALTY,
+            "completed": COMPLETED_PENALTY,
+        }.get(status, 0.0)
+        features.record(category, idea_id, penalty, counted)
+
+    def on_date_event(self, event: Dict[str, Any]) -> None:
+        """Обновить признаки пары после нового события свидания"""
+        features = self.features.get(event.get("couple_id"))
+        if features is MISSING:
+            # Признаки еще не строились - будут собраны по истории
+            return
+
+        status = event.get("date_status", "pending")
+        if status == "pending":
+            self._record(features, event, status, counted=True)
+            return
+
+        # Категория уже учтена при создании предложения; ответ и
+        # завершение только доводят штраф идеи до штрафа нового статуса
+        extra = {
+            "rejected": REJECTED_PENALTY - PROPOSED_PENALTY,
+            "completed": COMPLETED_PENALTY - PROPOSED_PENALTY,
+        }.get(status, 0.0)
+        features.record(None, _event_idea_id(event), extra, counted=False)
+
+
+recommender = IdeaRecommender(
+    idea_catalog,
+    category_boost=settings.RECOMMEND_CATEGORY_BOOST,
+    exploration=settings.RECOMMEND_EXPLORATION
+)
+
+
+async def recommend_ideas(couple_id: int, limit: int = 1, category: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Рекомендованные идеи для пары"""
+    features = await recommender.get_features(couple_id)
+    if limit == 1:
+        idea = recommender.pick(features, category)
+        return [idea] if idea else []
+    return recommender.top(features, limit, category)
+
+
+def setup_recommender() -> None:
+    """Обновлять признаки пар при изменении их свиданий"""
+    for event in ("proposal_created", "proposal_responded", "date_completed"):
+        api_client.subscribe(event, recommender.on_date_event)
+    logger.info("Idea recommender is subscribed to date events")
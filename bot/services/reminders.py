@@ -0,0 +1,377 @@
+import asyncio
+import heapq
+import itertools
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from loguru import logger
+
+from config import settings
+from middlewares.outbound import bulk_lane
+from services.api_client import APIClient, APIError, api_client
+from services.catalog import idea_catalog
+
+
+def parse_scheduled_date(value: Optional[str]) -> Optional[float]:
+    """Время свидания в секундах Unix из ISO-строки backend
+
+    Даты без часового пояса считаются местным временем сервера.
+    """
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+
+
+class ReminderStore:
+    """Хранилище напоминаний в локальной базе SQLite
+
+    Нужно только для того, чтобы напоминания пережили перезапуск бота:
+    при старте все записи загружаются в кучу планировщика, дальше
+    база лишь дописывается и чистится. save() и delete() не блокируют
+    event loop: изменения копятся в очереди, и фоновая задача записывает
+    все накопленное одной транзакцией в отдельном потоке.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._ops: List[Tuple[str, tuple]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def _open(self) -> None:
+        # Соединение используется из потоков asyncio.to_thread, но всегда
+        # одним из них за раз
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS reminders ("
+            " event_id INTEGER PRIMARY KEY,"
+            " couple_id INTEGER NOT NULL,"
+            " remind_at REAL NOT NULL,"
+            " scheduled_date TEXT,"
+            " title TEXT)"
+        )
+        self._db.commit()
+
+    async def open(self) -> None:
+        await asyncio.to_thread(self._open)
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self._writer = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Записать накопленные изменения и закрыть базу"""
+        if self._writer is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._writer
+            self._writer = None
+        if self._db is not None:
+            await asyncio.to_thread(self._db.close)
+            self._db = None
+
+    async def load(self) -> List[Tuple[int, int, float, Optional[str], Optional[str]]]:
+        return await asyncio.to_thread(
+            lambda: self._db.execute(
+                "SELECT event_id, couple_id, remind_at, scheduled_date, title FROM reminders"
+            ).fetchall()
+        )
+
+    def save(self, event_id: int, couple_id: int, remind_at: float, scheduled_date: Optional[str], title: Optional[str]) -> None:
+        self._enqueue(
+            "INSERT OR REPLACE INTO reminders VALUES (?, ?, ?, ?, ?)",
+            (event_id, couple_id, remind_at, scheduled_date, title)
+        )
+
+    def delete(self, event_id: int) -> None:
+        self._enqueue("DELETE FROM reminders WHERE event_id = ?", (event_id,))
+
+    def _enqueue(self, sql: str, args: tuple) -> None:
+        self._ops.append((sql, args))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _write(self, ops: List[Tuple[str, tuple]]) -> None:
+        with self._db:
+            for sql, args in ops:
+                self._db.execute(sql, args)
+
+    async def _run(self) -> None:
+        while True:
+            if not self._ops:
+                if self._closing:
+                    return
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            ops, self._ops = self._ops, []
+            try:
+                await asyncio.to_thread(self._write, ops)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to write {len(ops)} reminder changes: {e}")
+
+
+class ReminderScheduler:
+    """Напоминания парам о запланированных свиданиях
+
+    Напоминания лежат в куче по времени срабатывания: добавление стоит
+    O(log n), отмена - O(1) (запись удаляется из словаря активных, а
+    устаревший элемент кучи пропускается при извлечении). Когда
+    устаревших элементов становится больше половины, куча
+    перестраивается. Одна фоновая задача спит до ближайшего напоминания
+    и отправляет сработавшие пачками через низкоприоритетную очередь
+    исходящих сообщений.
+
+    Напоминание ставится при создании предложения и переставляется при
+    его принятии. Перед отправкой статус свидания перепроверяется в
+    backend: напоминание уходит только о принятом свидании, а пока
+    предложение ждет ответа, проверка повторяется каждые recheck_interval
+    секунд. Запись удаляется, когда свидание принято (и напоминание
+    отправлено), отклонено, завершено или уже прошло.
+    """
+
+    def __init__(
+        self,
+        client: APIClient,
+        store: ReminderStore,
+        lead_time: float,
+        recheck_interval: float,
+        batch_size: int = 50
+    ):
+        self.client = client
+        self.store = store
+        self.lead_time = lead_time
+        self.recheck_interval = recheck_interval
+        self.batch_size = batch_size
+        self.bot: Optional[Bot] = None
+        self._heap: List[Tuple[float, int, int]] = []
+        self._active: Dict[int, Dict[str, Any]] = {}
+        self._counter = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "scheduled": 0,
+            "cancelled": 0,
+            "delivered": 0,
+            "skipped": 0,
+            "rechecked": 0,
+            "failures": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    def setup(self, bot: Bot) -> None:
+        """Привязать бота и подписаться на события свиданий"""
+        self.bot = bot
+        self.client.subscribe("proposal_created", self.on_proposal_created)
+        self.client.subscribe("proposal_responded", self.on_proposal_responded)
+        self.client.subscribe("date_completed", self.on_proposal_finished)
+
+    def schedule(
+        self,
+        event_id: int,
+        couple_id: int,
+        remind_at: float,
+        scheduled_date: Optional[str] = None,
+        title: Optional[str] = None,
+        persist: bool = True
+    ) -> None:
+        """Запланировать (или перенести) напоминание о свидании"""
+        reminder = {
+            "event_id": event_id,
+            "couple_id": couple_id,
+            "remind_at": remind_at,
+            "scheduled_date": scheduled_date,
+            "title": title,
+        }
+        self._active[event_id] = reminder
+        heapq.heappush(self._heap, (remind_at, next(self._counter), event_id))
+        if persist:
+            self.store.save(event_id, couple_id, remind_at, scheduled_date, title)
+        self.stats["scheduled"] += 1
+
+        # Новое напоминание раньше всех остальных - разбудить планировщик
+        if self._wakeup is not None and self._heap[0][2] == event_id:
+            self._wakeup.set()
+
+    def cancel(self, event_id: int) -> None:
+        """Отменить напоминание; элемент кучи удалится при извлечении"""
+        if self._active.pop(event_id, None) is None:
+            return
+        self.store.delete(event_id)
+        self.stats["cancelled"] += 1
+        if len(self._heap) > 2 * len(self._active) + 64:
+            self._compact()
+
+    def _compact(self) -> None:
+        self._heap = [
+            item for item in self._heap
+            if (reminder := self._active.get(item[2])) is not None and reminder["remind_at"] == item[0]
+        ]
+        heapq.heapify(self._heap)
+
+    def _arm(self, event: Dict[str, Any]) -> None:
+        """Поставить напоминание за lead_time до свидания (или сразу)"""
+        known = self._active.get(event["id"]) or {}
+        scheduled_date = event.get("scheduled_date") or known.get("scheduled_date")
+        couple_id = event.get("couple_id") or known.get("couple_id")
+        scheduled_at = parse_scheduled_date(scheduled_date)
+        if scheduled_at is None or couple_id is None or scheduled_at <= time.time():
+            return
+        title = (event.get("idea") or idea_catalog.get(event.get("idea_id")) or {}).get("title") or known.get("title")
+        self.schedule(
+            event["id"],
+            couple_id,
+            max(scheduled_at - self.lead_time, time.time()),
+            scheduled_date,
+            title
+        )
+
+    def on_proposal_created(self, event: Dict[str, Any]) -> None:
+        # Предложение могут принять через другой экземпляр бота - тогда
+        # напоминание дождется этого при перепроверке статуса
+        self._arm(event)
+
+    def on_proposal_responded(self, event: Dict[str, Any]) -> None:
+        if event.get("date_status") == "accepted":
+            # Напоминание могло уже сработать, пока предложение ждало ответа
+            self._arm(event)
+        else:
+            self.cancel(event["id"])
+
+    def on_proposal_finished(self, event: Dict[str, Any]) -> None:
+        self.cancel(event["id"])
+
+    def _recheck_later(self, reminder: Dict[str, Any]) -> None:
+        """Проверить статус свидания еще раз позже, если оно еще не прошло"""
+        scheduled_at = parse_scheduled_date(reminder["scheduled_date"])
+        now = time.time()
+        if scheduled_at is None or scheduled_at <= now:
+            self.store.delete(reminder["event_id"])
+            return
+        self.stats["rechecked"] += 1
+        self.schedule(
+            reminder["event_id"],
+            reminder["couple_id"],
+            min(now + self.recheck_interval, scheduled_at),
+            reminder["scheduled_date"],
+            reminder["title"]
+        )
+
+    def _pop_due(self, now: float) -> List[Dict[str, Any]]:
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+            remind_at, _, event_id = heapq.heappop(self._heap)
+            reminder = self._active.get(event_id)
+            # Отмененное или перенесенное напоминание
+            if reminder is None or reminder["remind_at"] != remind_at:
+                continue
+            del self._active[event_id]
+            due.append(reminder)
+        return due
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            due = self._pop_due(time.time())
+            if due:
+                await asyncio.gather(*(self._deliver(reminder) for reminder in due))
+                continue
+
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _deliver(self, reminder: Dict[str, Any]) -> None:
+        event_id = reminder["event_id"]
+        try:
+            # Предложение могли принять или отклонить через другой
+            # экземпляр бота - его события сюда не приходят
+            status = (await self.client.get_date_event(event_id)).get("date_status")
+        except APIError as e:
+            self.stats["failures"] += 1
+            logger.warning(f"Failed to check date {event_id} before reminding: {e}")
+            status = None
+
+        if event_id in self._active:
+            # Пока ждали backend, напоминание переставили (предложение приняли)
+            return
+        if status is None or status == "pending":
+            self._recheck_later(reminder)
+            return
+
+        if status == "accepted":
+            try:
+                await self._send(reminder)
+                self.stats["delivered"] += 1
+            except APIError as e:
+                self.stats["failures"] += 1
+                logger.warning(f"Failed to deliver reminder for date {event_id}: {e}")
+            except Exception as e:
+                self.stats["failures"] += 1
+                logger.exception(f"Failed to deliver reminder for date {event_id}: {e}")
+        else:
+            self.stats["skipped"] += 1
+        # Повторно не отправляем, чтобы не засыпать пару дублями; при
+        # остановке бота (отмене) напоминание остается в базе
+        self.store.delete(event_id)
+
+    async def _send(self, reminder: Dict[str, Any]) -> None:
+        couple = await self.client.get_couple(reminder["couple_id"])
+        user_ids = [user_id for user_id in (couple.get("user1_id"), couple.get("user2_id")) if user_id]
+        users = await asyncio.gather(*(self.client.get_user(user_id) for user_id in user_ids))
+
+        text = f"⏰ Напоминание: скоро свидание *{reminder['title'] or 'по вашему плану'}*"
+        if reminder["scheduled_date"]:
+            text += f"\n📅 {reminder['scheduled_date']}"
+
+        with bulk_lane():
+            for user in users:
+                if user.get("telegram_id"):
+                    await self.bot.send_message(user["telegram_id"], text, parse_mode="Markdown")
+
+    async def start(self) -> None:
+        """Загрузить сохраненные напоминания и запустить планировщик"""
+        await self.store.open()
+        for event_id, couple_id, remind_at, scheduled_date, title in await self.store.load():
+            self.schedule(event_id, couple_id, remind_at, scheduled_date, title, persist=False)
+        logger.info(f"Loaded {len(self._active)} date reminders")
+
+        self._wakeup = asyncio.Event()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить планировщик; неотправленные напоминания остаются в базе"""
+        task, self._task = self._task, None
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self.store.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "pending": len(self._active), "heap_size": len(self._heap)}
+
+
+reminder_scheduler = ReminderScheduler(
+    api_client,
+    ReminderStore(settings.REMINDERS_DB_PATH),
+    lead_time=settings.REMINDER_LEAD_TIME,
+    recheck_interval=settings.REMINDER_RECHECK_INTERVAL
+)
@@ -0,0 +1,106 @@
+import random
+import time
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+
+class RetryPolicy:
+    """Политика повторов запроса
+
+    attempts - сколько всего попыток (1 - без повторов), timeout - таймаут
+    одной попытки. Пауза перед повтором выбирается случайно от 0 до
+    base_delay * 2**n, но не больше max_delay ("full jitter"), чтобы
+    повторы многих клиентов не приходили в backend одновременно.
+    """
+
+    __slots__ = ("attempts", "timeout", "base_delay", "max_delay")
+
+    def __init__(self, attempts: int, timeout: float, base_delay: float = 0.2, max_delay: float = 2.0):
+        self.attempts = max(1, attempts)
+        self.timeout = timeout
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        """Пауза перед повтором после неудачной попытки attempt (с нуля)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Автоматический выключатель запросов к одному backend
+
+    closed - запросы идут как обычно; после failure_threshold неудач
+    подряд переходит в open и сразу отклоняет запросы. Через
+    recovery_timeout секунд пропускается один пробный запрос (half_open):
+    успех замыкает выключатель, неудача снова размыкает его. Если ответ
+    на пробный запрос так и не пришел (например, его отменили), следующий
+    пробный запрос пропускается еще через recovery_timeout.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._changed_at = time.monotonic()
+        self.stats = {
+            "opened": 0,
+            "rejected": 0,
+            "successes": 0,
+            "failures": 0,
+        }
+
+    def allow(self) -> bool:
+        """Можно ли отправить запрос сейчас"""
+        if self.state == self.CLOSED:
+            return True
+
+        now = time.monotonic()
+        if now - self._opened_at >= self.recovery_timeout:
+            if self.state == self.OPEN:
+                self._set_state(self.HALF_OPEN)
+            # Пробный запрос; остальные ждут его результата
+            self._opened_at = now
+            return True
+
+        self.stats["rejected"] += 1
+        return False
+
+    def record_success(self) -> None:
+        self.stats["successes"] += 1
+        self.failures = 0
+        if self.state != self.CLOSED:
+            self._set_state(self.CLOSED)
+            logger.info(f"Circuit breaker {self.name} closed, backend is available again")
+
+    def record_failure(self) -> None:
+        self.stats["failures"] += 1
+        self.failures += 1
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+            self._opened_at = time.monotonic()
+            self.stats["opened"] += 1
+            self._set_state(self.OPEN)
+            logger.warning(
+                f"Circuit breaker {self.name} opened after {self.failures} failures, "
+                f"retrying in {self.recovery_timeout}s"
+            )
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        self._changed_at = time.monotonic()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Состояние выключателя для метрик"""
+        return {
+            **self.stats,
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "state_age": time.monotonic() - self._changed_at,
+        }
@@ -0,0 +1,145 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from loguru import logger
+
+from services.api_client import request_deadline
+
+
+def get_chat_key(update: Update) -> Optional[int]:
+    """Ключ очереди апдейта: id чата, а если чата нет - id пользователя"""
+    event = update.event
+    chat = getattr(event, "chat", None)
+    if chat is None:
+        # CallbackQuery хранит чат в исходном сообщении
+        chat = getattr(getattr(event, "message", None), "chat", None)
+    if chat is not None:
+        return chat.id
+
+    user = getattr(event, "from_user", None)
+    return user.id if user else None
+
+
+class UpdateScheduler:
+    """Планировщик обработки апдейтов
+
+    Апдейты разных чатов обрабатываются параллельно, но не больше
+    max_concurrency одновременно. Апдейты одного чата выполняются строго
+    по очереди в порядке поступления, поэтому переходы FSM не гонятся
+    друг с другом.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._chat_locks: Dict[int, asyncio.Lock] = {}
+        self._chat_depth: Dict[int, int] = {}
+        self._queued = 0
+        self._active = 0
+        self.stats = {
+            "processed": 0,
+            "max_queued": 0,
+            "max_chat_depth": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+        }
+
+    async def run(self, key: Optional[int], func: Callable[[], Awaitable[Any]]) -> Any:
+        """Выполнить обработку апдейта с ключом key"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        queued_at = time.monotonic()
+        self._queued += 1
+        self.stats["max_queued"] = max(self.stats["max_queued"], self._queued)
+        dequeued = False
+
+        lock = None
+        if key is not None:
+            lock = self._chat_locks.get(key)
+            if lock is None:
+                lock = self._chat_locks[key] = asyncio.Lock()
+            depth = self._chat_depth[key] = self._chat_depth.get(key, 0) + 1
+            self.stats["max_chat_depth"] = max(self.stats["max_chat_depth"], depth)
+
+        try:
+            if lock is not None:
+                await lock.acquire()
+            try:
+                async with self._semaphore:
+                    dequeued = True
+                    self._queued -= 1
+                    self._record_wait(time.monotonic() - queued_at, key)
+
+                    self._active += 1
+                    try:
+                        return await func()
+                    finally:
+                        self._active -= 1
+                        self.stats["processed"] += 1
+            finally:
+                if lock is not None:
+                    lock.release()
+        finally:
+            if not dequeued:
+                self._queued -= 1
+            if key is not None:
+                self._chat_depth[key] -= 1
+                if not self._chat_depth[key]:
+                    # Очередь чата пуста, блокировка больше не нужна
+                    del self._chat_depth[key]
+                    del self._chat_locks[key]
+
+    def _record_wait(self, waited: float, key: Optional[int]) -> None:
+        self.stats["wait_time_total"] += waited
+        self.stats["wait_time_max"] = max(self.stats["wait_time_max"], waited)
+        if waited > 1.0:
+            logger.warning(f"Update for chat {key} waited {waited:.2f}s in queue (queued={self._queued})")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Глубина очереди и время ожидания апдейтов"""
+        started = self.stats["processed"] + self._active
+        return {
+            **self.stats,
+            "queued": self._queued,
+            "active": self._active,
+            "chats": len(self._chat_locks),
+            "max_concurrency": self.max_concurrency,
+            "wait_time_avg": self.stats["wait_time_total"] / started if started else 0.0,
+        }
+
+
+class SchedulingDispatcher(Dispatcher):
+    """Dispatcher, пропускающий каждый апдейт через UpdateScheduler
+
+    Планирование выполняется до outer middleware, в том числе до чтения
+    состояния FSM, чтобы следующий апдейт чата видел уже новое состояние.
+    Работает и для polling, и для webhook: оба режима вызывают feed_update.
+
+    Если задан deadline, крайний срок апдейта (request_deadline) ставится,
+    когда апдейт дождался своей очереди и начинает обрабатываться: долгий
+    предыдущий апдейт того же чата не съедает бюджет следующего.
+    """
+
+    def __init__(self, *args: Any, scheduler: UpdateScheduler, deadline: Optional[float] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.scheduler = scheduler
+        self.deadline = deadline
+
+    async def feed_update(self, bot: Bot, update: Update, **kwargs: Any) -> Any:
+        parent = super()
+
+        async def process() -> Any:
+            token = None
+            if self.deadline is not None and request_deadline.get() is None:
+                token = request_deadline.set(time.monotonic() + self.deadline)
+            try:
+                return await parent.feed_update(bot, update, **kwargs)
+            finally:
+                if token is not None:
+                    request_deadline.reset(token)
+
+        return await self.scheduler.run(get_chat_key(update), process)
@@ -0,0 +1,161 @@
+import re
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from services.catalog import IdeaCatalog, idea_catalog
+
+
+# Вес совпадения в зависимости от поля идеи
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "category": 2.0,
+    "description": 1.0,
+}
+# Совпадение по префиксу весит меньше совпадения целого слова
+PREFIX_FACTOR = 0.5
+# Сколько слов словаря максимум подставлять вместо одного префикса
+MAX_PREFIX_EXPANSIONS = 50
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Разбить текст на слова: нижний регистр, ё -> е"""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(text.lower().replace("ё", "е"))
+
+
+class IdeaSearchIndex:
+    """Инвертированный индекс по идеям каталога
+
+    Для каждого слова хранится {id идеи: вес}, где вес - сумма весов
+    полей (название, категория, описание), в которых слово встречается.
+    Последнее слово запроса ищется и как префикс - по отсортированному
+    словарю через bisect. Индекс обновляется вместе с каталогом, поэтому
+    поиск не обращается к backend.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._doc_tokens: Dict[int, Set[str]] = {}
+        self._vocabulary: List[str] = []
+        self._vocabulary_dirty = False
+
+    def __len__(self) -> int:
+        return len(self._doc_tokens)
+
+    def add(self, idea: Dict[str, Any]) -> None:
+        """Проиндексировать идею (заменяя прежнюю версию)"""
+        idea_id = idea.get("id")
+        if idea_id is None:
+            return
+        self.remove(idea_id)
+
+        weights: Dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in set(tokenize(idea.get(field))):
+                weights[token] = weights.get(token, 0.0) + weight
+
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                self._vocabulary_dirty = True
+            postings[idea_id] = weight
+        self._doc_tokens[idea_id] = set(weights)
+
+    def remove(self, idea_id: int) -> None:
+        """Убрать идею из индекса"""
+        for token in self._doc_tokens.pop(idea_id, ()):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(idea_id, None)
+            if not postings:
+                del self._postings[token]
+                self._vocabulary_dirty = True
+
+    def clear(self) -> None:
+        self._postings.clear()
+        self._doc_tokens.clear()
+        self._vocabulary = []
+        self._vocabulary_dirty = False
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        """Слова словаря, начинающиеся с prefix"""
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+
+        words = []
+        position = bisect_left(self._vocabulary, prefix)
+        while position < len(self._vocabulary) and len(words) < MAX_PREFIX_EXPANSIONS:
+            word = self._vocabulary[position]
+            if not word.startswith(prefix):
+                break
+            words.append(word)
+            position += 1
+        return words
+
+    def _match(self, token: str, prefix: bool) -> Dict[int, float]:
+        """Оценки идей, совпавших с одним словом запроса"""
+        scores = dict(self._postings.get(token, {}))
+        if not prefix:
+            return scores
+
+        for word in self._expand_prefix(token):
+            if word == token:
+                continue
+            for idea_id, weight in self._postings[word].items():
+                score = weight * PREFIX_FACTOR
+                if score > scores.get(idea_id, 0.0):
+                    scores[idea_id] = score
+        return scores
+
+    def search(self, query: str, limit: int = 10) -> List[int]:
+        """id идей, содержащих все слова запроса, по убыванию релевантности"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        # Пользователь мог не дописать последнее слово
+        matches = [self._match(token, prefix=i == len(tokens) - 1) for i, token in enumerate(tokens)]
+        matches.sort(key=len)
+
+        totals = matches[0]
+        for scores in matches[1:]:
+            if not totals:
+                break
+            totals = {
+                idea_id: total + scores[idea_id]
+                for idea_id, total in totals.items()
+                if idea_id in scores
+            }
+
+        ranked = sorted(totals.items(), key=lambda x: (-x[1], x[0]))
+        return [idea_id for idea_id, _ in ranked[:limit]]
+
+    def on_catalog_change(self, upserted: Iterable[Dict[str, Any]], removed: Iterable[int]) -> None:
+        """Слушатель IdeaCatalog: применить изменения каталога к индексу"""
+        for idea_id in removed:
+            self.remove(idea_id)
+        for idea in upserted:
+            self.add(idea)
+
+
+idea_index = IdeaSearchIndex()
+
+
+def search_ideas(query: str, limit: int = 10, catalog: IdeaCatalog = idea_catalog) -> List[Dict[str, Any]]:
+    """Найти идеи каталога по тексту запроса"""
+    ideas = (catalog.get(idea_id) for idea_id in idea_index.search(query, limit))
+    return [idea for idea in ideas if idea is not None]
+
+
+def setup_search() -> None:
+    """Поддерживать поисковый индекс вместе с каталогом идей"""
+    idea_index.clear()
+    for idea in idea_catalog.all():
+        idea_index.add(idea)
+    idea_catalog.add_listener(idea_index.on_catalog_change)
@@ -0,0 +1,72 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Статусы, означающие, что партнер согласился на свидание
+ACCEPTED_STATUSES = ("accepted", "completed")
+
+
+class CoupleStats:
+    """Агрегированная статистика свиданий пары
+
+    Считается один раз по всей истории, а затем обновляется на месте
+    при создании предложения, ответе на него и завершении свидания.
+    """
+
+    __slots__ = ("total", "by_status", "by_category", "last_date_at")
+
+    def __init__(self):
+        self.total = 0
+        self.by_status: Dict[str, int] = {}
+        self.by_category: Dict[str, int] = {}
+        self.last_date_at: Optional[str] = None
+
+    def count(self, status: str) -> int:
+        return self.by_status.get(status, 0)
+
+    def add(self, event: Dict[str, Any]) -> None:
+        """Учесть новое событие"""
+        self.total += 1
+        status = event.get("date_status", "pending")
+        self.by_status[status] = self.count(status) + 1
+
+        category = (event.get("idea") or {}).get("category")
+        if category:
+            self.by_category[category] = self.by_category.get(category, 0) + 1
+
+        if status == "completed":
+            self._touch_last_date(event)
+
+    def change_status(self, old_status: str, event: Dict[str, Any]) -> None:
+        """Учесть смену статуса существующего события"""
+        new_status = event.get("date_status")
+        if not new_status or new_status == old_status:
+            return
+
+        if self.count(old_status) > 0:
+            self.by_status[old_status] -= 1
+        self.by_status[new_status] = self.count(new_status) + 1
+
+        if new_status == "completed":
+            self._touch_last_date(event)
+
+    def _touch_last_date(self, event: Dict[str, Any]) -> None:
+        date = event.get("completed_at") or event.get("scheduled_date") or event.get("created_at")
+        # Даты приходят в ISO 8601, поэтому их можно сравнивать как строки
+        if date and (self.last_date_at is None or date > self.last_date_at):
+            self.last_date_at = date
+
+    @property
+    def acceptance_rate(self) -> float:
+        """Доля принятых предложений среди тех, на которые уже ответили"""
+        accepted = sum(self.count(status) for status in ACCEPTED_STATUSES)
+        answered = accepted + self.count("rejected")
+        return accepted / answered if answered else 0.0
+
+    @property
+    def completion_rate(self) -> float:
+        """Доля завершенных свиданий среди всех предложений"""
+        return self.count("completed") / self.total if self.total else 0.0
+
+    def top_categories(self, limit: int = 3) -> List[Tuple[str, int]]:
+        """Самые популярные категории"""
+        return sorted(self.by_category.items(), key=lambda x: x[1], reverse=True)[:limit]
@@ -0,0 +1,67 @@
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisStorage
+from loguru import logger
+from redis.asyncio import Redis
+from redis.exceptions import WatchError
+
+from config import settings
+
+
+class PipelinedRedisStorage(RedisStorage):
+    """RedisStorage, выполняющий update_data за одну транзакцию
+
+    Стандартный update_data делает отдельные GET и SET, и параллельные
+    апдейты с разных реплик могут затереть данные друг друга. Здесь
+    чтение и запись идут через один pipeline с WATCH/MULTI.
+    """
+
+    async def update_data(self, key: StorageKey, data: Dict[str, Any]) -> Dict[str, Any]:
+        redis_key = self.key_builder.build(key, "data")
+        async with self.redis.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(redis_key)
+                    raw = await pipe.get(redis_key)
+                    current = self.json_loads(raw) if raw else {}
+                    current.update(data)
+
+                    pipe.multi()
+                    if current:
+                        pipe.set(redis_key, self.json_dumps(current), ex=self.data_ttl)
+                    else:
+                        pipe.delete(redis_key)
+                    await pipe.execute()
+                    return current.copy()
+                except WatchError:
+                    # Данные изменились между чтением и записью, повторяем
+                    continue
+
+
+def create_storage(redis: Optional[Redis] = None) -> BaseStorage:
+    """Создать хранилище FSM согласно FSM_STORAGE
+
+    "memory" - состояния живут в памяти процесса и теряются при перезапуске;
+    "redis" - состояния хранятся в Redis (REDIS_URL) и общие для всех реплик.
+    Вместо REDIS_URL можно передать готовый клиент, например
+    fakeredis.aioredis.FakeRedis(), чтобы проверить работу без сервера.
+    """
+    if settings.FSM_STORAGE == "memory":
+        return MemoryStorage()
+    if settings.FSM_STORAGE != "redis":
+        raise ValueError(f"Unknown FSM_STORAGE: {settings.FSM_STORAGE}")
+
+    if redis is None:
+        redis = Redis.from_url(settings.REDIS_URL)
+
+    # Ключи вида <prefix>:<bot_id>:<chat_id>:<user_id>:<state|data>
+    key_builder = DefaultKeyBuilder(prefix=settings.FSM_KEY_PREFIX, with_bot_id=True)
+    logger.info(f"Using Redis FSM storage with prefix '{settings.FSM_KEY_PREFIX}'")
+    return PipelinedRedisStorage(
+        redis=redis,
+        key_builder=key_builder,
+        state_ttl=settings.FSM_STATE_TTL or None,
+        data_ttl=settings.FSM_DATA_TTL or None
+    )